@@ -0,0 +1,341 @@
+"""API HTTP leve com as métricas do painel, consultas de contratos e perguntas aos PDFs.
+
+Uso:
+    python api.py --porta 8000 --workers 8
+
+Rotas:
+    GET  /metricas?ano=2024&status=RENOVADO&mes=JANEIRO   (parâmetros repetíveis)
+    GET  /contratos?contrato=123&sistema=ABC[&ano=2024]
+    GET  /historico?ano=2024[&contrato=123&inicio=2024-01-01&fim=2024-12-31&pagina=1&tamanho=50]
+    POST /perguntas   {"pergunta": "...", "historico": [["pergunta", "resposta"], ...]}
+    GET  /estatisticas                                    (latência por rota)
+
+Os dados de cada ano e o índice dos PDFs são carregados uma vez e
+compartilhados entre as requisições; os dados são relidos quando a versão
+da partição muda. As requisições são atendidas por um pool limitado de
+threads; acima da fila máxima, a resposta é 503.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+from armazenamento import obter_armazenamento
+from esquema import ESQUEMA_CONTRATOS, aplicar_esquema, tipos_para_gravacao
+from historico import obter_historico
+from indice_contratos import IndiceContratos
+from metricas import process_data, calculate_metrics, calcular_metricas
+
+MAX_AMOSTRAS_LATENCIA = 1000
+
+
+class ErroRequisicao(Exception):
+    """Erro de validação, devolvido ao cliente com o status informado."""
+
+    def __init__(self, mensagem: str, status: int = 400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class CacheDados:
+    """Contratos de cada ano com seu índice, reaproveitados enquanto a versão não mudar."""
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+        self._anos = {}
+        self._lock = threading.Lock()
+
+    def anos(self, pedidos: list) -> list:
+        disponiveis = self.armazenamento.anos()
+        if not pedidos:
+            return disponiveis[-1:]
+        invalidos = [ano for ano in pedidos if ano not in disponiveis]
+        if invalidos:
+            raise ErroRequisicao(f"Ano(s) sem dados: {invalidos}", 404)
+        return sorted(pedidos)
+
+    def contratos(self, ano: int) -> tuple:
+        """Retorna (DataFrame de contratos, IndiceContratos) do ano."""
+        versao = self.armazenamento.versao(ano)
+        with self._lock:
+            atual = self._anos.get(ano)
+            if atual is None or atual[0] != versao:
+                df = aplicar_esquema(self.armazenamento.ler('Contratos', ano), ESQUEMA_CONTRATOS)
+                atual = (versao, df, IndiceContratos(df))
+                self._anos[ano] = atual
+            return atual[1], atual[2]
+
+
+class Latencias:
+    """Contagem, erros e latência (p50/p95/máx.) por rota."""
+
+    def __init__(self):
+        self._amostras = defaultdict(lambda: deque(maxlen=MAX_AMOSTRAS_LATENCIA))
+        self._contagem = defaultdict(int)
+        self._erros = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def registrar(self, rota: str, segundos: float, erro: bool):
+        with self._lock:
+            self._amostras[rota].append(segundos)
+            self._contagem[rota] += 1
+            self._erros[rota] += erro
+
+    def resumo(self) -> dict:
+        with self._lock:
+            resumo = {}
+            for rota, amostras in self._amostras.items():
+                ordenadas = sorted(amostras)
+                resumo[rota] = {
+                    'requisicoes': self._contagem[rota],
+                    'erros': self._erros[rota],
+                    'p50_ms': round(ordenadas[len(ordenadas) // 2] * 1000, 2),
+                    'p95_ms': round(ordenadas[min(int(len(ordenadas) * 0.95), len(ordenadas) - 1)] * 1000, 2),
+                    'max_ms': round(ordenadas[-1] * 1000, 2),
+                }
+            return resumo
+
+
+class ServicoDocumentos:
+    """Cadeia de perguntas sobre os PDFs, compartilhada entre as requisições.
+
+    A indexação usa a mesma tarefa em segundo plano da página do chat; até
+    ela terminar, as perguntas recebem 503 com o progresso.
+    """
+
+    SESSAO = 'api'
+
+    def __init__(self):
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    def _cadeia(self):
+        """Cadeia do corpus atual, montada quando a indexação dele termina."""
+        # Importação tardia: a API de métricas não depende da pilha de LLM
+        from indexacao import hash_corpus, iniciar_indexacao, vector_store_da_tarefa, CONCLUIDA, ERRO, CANCELADA
+        from utils import PASTA_ARQUIVOS, monta_chain, validar_openai_key
+
+        # O hash do corpus fica em cache pela data e tamanho dos PDFs: nada é relido por requisição
+        chave = hash_corpus(PASTA_ARQUIVOS)
+        with self._lock:
+            chain = self._chains.get(chave)
+        if chain is not None:
+            return chain
+
+        api_key = validar_openai_key()
+        if not api_key:
+            raise ErroRequisicao("Chave OpenAI não configurada.", 503)
+        tarefa = iniciar_indexacao(PASTA_ARQUIVOS, api_key, self.SESSAO)
+        if tarefa.status in (ERRO, CANCELADA):
+            raise ErroRequisicao(f"Falha na indexação dos documentos: {tarefa.erro or tarefa.status}", 503)
+        if tarefa.status != CONCLUIDA:
+            raise ErroRequisicao(f"Documentos em indexação ({tarefa.progresso():.0%}).", 503)
+
+        with self._lock:
+            chain = self._chains.get(tarefa.chave)
+            if chain is None:
+                # Sem memória: o histórico vem na requisição e a cadeia pode ser usada em paralelo
+                chain = monta_chain(vector_store_da_tarefa(tarefa), api_key, verbose=False)
+                # Só a cadeia do corpus atual é mantida
+                self._chains = {tarefa.chave: chain}
+        return chain
+
+    def responder(self, pergunta: str, historico: list) -> dict:
+        chain = self._cadeia()
+        resposta = chain.invoke({'question': pergunta, 'chat_history': [tuple(par) for par in historico]})
+        return {
+            'resposta': resposta['answer'],
+            'fontes': [
+                {'fonte': doc.metadata.get('source'), 'pagina': doc.metadata.get('page')}
+                for doc in resposta.get('source_documents', [])
+            ],
+        }
+
+
+def _lista(params: dict, nome: str) -> list:
+    return [valor for valor in params.get(nome, []) if valor != '']
+
+
+def _anos(params: dict) -> list:
+    try:
+        return [int(ano) for ano in _lista(params, 'ano')]
+    except ValueError:
+        raise ErroRequisicao("O parâmetro 'ano' deve ser numérico.")
+
+
+def metricas(params: dict) -> dict:
+    """Mesmas métricas do painel, com os filtros de ano, status e mês."""
+    anos = cache.anos(_anos(params))
+    status = _lista(params, 'status') or None
+    meses = _lista(params, 'mes') or None
+    if cache.armazenamento.suporta_consultas:
+        valores = calcular_metricas(cache.armazenamento, anos, status, meses)
+    else:
+        df = process_data(pd.concat([cache.contratos(ano)[0] for ano in anos], ignore_index=True))
+        if status is not None:
+            df = df[df['STATUS / AÇÃO'].isin(status)]
+        if meses is not None:
+            df = df[df['MÊS'].isin(meses)]
+        valores = calculate_metrics(df)
+    return {'anos': anos, 'metricas': {nome: float(valor) for nome, valor in valores.items()}}
+
+
+def contratos(params: dict) -> dict:
+    """Linhas de um contrato pela chave (CONTRATO Nº, SISTEMA)."""
+    contrato, sistema = params.get('contrato', [''])[0], params.get('sistema', [''])[0]
+    if not contrato or not sistema:
+        raise ErroRequisicao("Informe 'contrato' e 'sistema'.")
+    linhas = []
+    for ano in cache.anos(_anos(params) or cache.armazenamento.anos()):
+        df, indice = cache.contratos(ano)
+        encontrados = tipos_para_gravacao(df.loc[indice.localizar(contrato, sistema)])
+        registros = json.loads(encontrados.to_json(orient='records', date_format='iso', force_ascii=False))
+        linhas.extend(dict(registro, ANO=ano) for registro in registros)
+    if not linhas:
+        raise ErroRequisicao("Contrato não encontrado.", 404)
+    return {'contrato': contrato, 'sistema': sistema, 'linhas': linhas}
+
+
+def historico(params: dict) -> dict:
+    """Uma página do log de alterações do ano, da mais recente à mais antiga."""
+    anos = cache.anos(_anos(params))
+    if len(anos) != 1:
+        raise ErroRequisicao("Informe um único 'ano'.")
+    primeiro = lambda nome: (_lista(params, nome) or [None])[0]
+    try:
+        inicio, fim = [pd.Timestamp(valor) if valor else None for valor in (primeiro('inicio'), primeiro('fim'))]
+        numero, tamanho = int(primeiro('pagina') or 1), int(primeiro('tamanho') or 50)
+    except ValueError:
+        raise ErroRequisicao("Parâmetros de data ou de paginação inválidos.")
+    log = obter_historico(anos[0])
+    pagina = log.consultar(primeiro('contrato'), inicio, fim, max(numero, 1), min(max(tamanho, 1), 500))
+    return {
+        'ano': anos[0],
+        'total': log.contar(primeiro('contrato'), inicio, fim),
+        'linhas': json.loads(pagina.to_json(orient='records', date_format='iso', force_ascii=False)),
+    }
+
+
+def perguntas(corpo: dict) -> dict:
+    pergunta = str(corpo.get('pergunta', '')).strip()
+    if not pergunta:
+        raise ErroRequisicao("Informe a 'pergunta'.")
+    return documentos.responder(pergunta, corpo.get('historico', []))
+
+
+ROTAS_GET = {
+    '/metricas': metricas,
+    '/contratos': contratos,
+    '/historico': historico,
+    '/estatisticas': lambda params: latencias.resumo(),
+}
+ROTAS_POST = {
+    '/perguntas': perguntas,
+}
+
+cache = None
+documentos = ServicoDocumentos()
+latencias = Latencias()
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    def _responder(self, corpo: dict, status: int = 200):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _atender(self, rotas: dict, argumento):
+        inicio = time.perf_counter()
+        rota = urlsplit(self.path).path.rstrip('/') or '/'
+        status = 200
+        try:
+            if rota not in rotas:
+                raise ErroRequisicao("Rota não encontrada.", 404)
+            self._responder(rotas[rota](argumento()))
+        except ErroRequisicao as e:
+            status = e.status
+            self._responder({'erro': str(e)}, status)
+        except Exception as e:
+            status = 500
+            self._responder({'erro': f"Erro interno: {e}"}, status)
+        finally:
+            latencias.registrar(f'{self.command} {rota}', time.perf_counter() - inicio, status >= 500)
+
+    def do_GET(self):
+        self._atender(ROTAS_GET, lambda: parse_qs(urlsplit(self.path).query))
+
+    def do_POST(self):
+        def corpo():
+            tamanho = int(self.headers.get('Content-Length', 0))
+            try:
+                return json.loads(self.rfile.read(tamanho) or b'{}')
+            except ValueError:
+                raise ErroRequisicao("Corpo JSON inválido.")
+        self._atender(ROTAS_POST, corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorComPool(HTTPServer):
+    """Atende cada conexão em um pool limitado de threads.
+
+    Conexões além de `workers + fila` recebem 503 em vez de esperar
+    indefinidamente.
+    """
+
+    def __init__(self, endereco, manipulador, workers: int, fila: int):
+        super().__init__(endereco, manipulador)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self._vagas = threading.BoundedSemaphore(workers + fila)
+
+    def process_request(self, request, client_address):
+        if not self._vagas.acquire(blocking=False):
+            request.sendall(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            self.shutdown_request(request)
+            return
+        self._executor.submit(self._processar, request, client_address)
+
+    def _processar(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._vagas.release()
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
+
+
+def main():
+    global cache
+    parser = argparse.ArgumentParser(description="API HTTP do painel de contratos.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=8, help="Requisições atendidas simultaneamente")
+    parser.add_argument('--fila', type=int, default=32, help="Requisições aguardando um worker antes de recusar")
+    args = parser.parse_args()
+
+    cache = CacheDados(obter_armazenamento())
+    servidor = ServidorComPool((args.host, args.porta), Manipulador, args.workers, args.fila)
+    print(f"API em http://{args.host}:{args.porta} ({args.workers} workers)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+import pandas as pd
+from configs import STORAGE_BACKEND, SQLITE_PATH
+
+PASTA_DATASETS = Path(__file__).resolve().parent / 'planilhas'
+PADRAO_PARTICAO = re.compile(r'^(\d{4})\.xlsx$')
+ABAS = ('Contratos', 'Históricos')
+# Ano da planilha única (planilhas/2024.xlsx) usada antes do particionamento por ano
+ANO_LEGADO = 2024
+COLUNAS_DATA = ('INÍCIO', 'TÉRMINO', 'DATA')
+
+
+class ConflitoDeVersao(Exception):
+    """Os dados foram alterados por outra sessão desde a última leitura."""
+
+
+class TravaArquivo:
+    """Trava entre sessões e processos baseada na criação exclusiva de um arquivo .lock.
+
+    Travas mais antigas que `expiracao` segundos são consideradas abandonadas.
+    """
+
+    def __init__(self, caminho: Path, timeout: float = 10.0, expiracao: float = 60.0):
+        self.caminho = Path(caminho)
+        self.timeout = timeout
+        self.expiracao = expiracao
+        self._fd = None
+
+    def __enter__(self):
+        limite = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self._fd, str(os.getpid()).encode())
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - self.caminho.stat().st_mtime > self.expiracao:
+                        self.caminho.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > limite:
+                    raise TimeoutError(f"Não foi possível obter a trava {self.caminho.name}.")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        os.close(self._fd)
+        self.caminho.unlink(missing_ok=True)
+
+
+class _Armazenamento:
+    """Escrita com trava e verificação otimista de versão, comum aos armazenamentos.
+
+    Os dados são particionados por ano. `salvar` recebe a versão da partição
+    lida pela sessão; se ela mudou desde então, levanta ConflitoDeVersao em vez
+    de sobrescrever a alteração de outra sessão.
+    """
+
+    suporta_consultas = False
+
+    def existe(self) -> bool:
+        return bool(self.anos())
+
+    def salvar(self, planilhas: dict, ano: int, versao_esperada=None, ao_gravar=None):
+        """Substitui as abas informadas ({nome_da_aba: DataFrame}) da partição em uma única escrita.
+
+        `ao_gravar` é chamado ainda dentro da trava, logo após a escrita (ex.:
+        registrar o histórico); um erro nele é propagado a quem salvou.
+
+        Returns:
+            A nova versão da partição.
+        """
+        with self.trava(ano):
+            if versao_esperada is not None and self.versao(ano) != versao_esperada:
+                raise ConflitoDeVersao()
+            self._gravar(planilhas, ano)
+            if ao_gravar is not None:
+                ao_gravar()
+            return self.versao(ano)
+
+    def anexar(self, aba: str, linhas: pd.DataFrame, ano: int, ao_gravar=None) -> tuple:
+        """Acrescenta linhas a uma aba da partição. Inclusões não conflitam entre si.
+
+        Returns:
+            tuple: (versão antes da escrita, versão depois da escrita)
+        """
+        with self.trava(ano):
+            anterior = self.versao(ano)
+            self._acrescentar(aba, linhas, ano)
+            if ao_gravar is not None:
+                ao_gravar()
+            return anterior, self.versao(ano)
+
+
+class ArmazenamentoExcel(_Armazenamento):
+    """Armazenamento em planilhas Excel, uma por ano (planilhas/AAAA.xlsx).
+
+    Cada planilha é uma partição, lida apenas quando o ano é solicitado.
+    """
+
+    def __init__(self, pasta: Path = PASTA_DATASETS):
+        self.pasta = Path(pasta)
+
+    def __str__(self):
+        return f'{self.pasta.name}/AAAA.xlsx'
+
+    def arquivo(self, ano: int) -> Path:
+        return self.pasta / f'{ano}.xlsx'
+
+    def anos(self) -> list:
+        """Anos disponíveis, descobertos pelos nomes das planilhas."""
+        encontrados = (PADRAO_PARTICAO.match(arquivo.name) for arquivo in self.pasta.glob('*.xlsx'))
+        return sorted(int(m.group(1)) for m in encontrados if m)
+
+    def trava(self, ano: int) -> TravaArquivo:
+        return TravaArquivo(self.pasta / f'.{ano}.xlsx.lock')
+
+    def versao(self, ano: int):
+        """Versão barata (data de modificação e tamanho da planilha do ano)."""
+        try:
+            info = self.arquivo(ano).stat()
+        except FileNotFoundError:
+            return None
+        return f'{info.st_mtime_ns}-{info.st_size}'
+
+    def ler(self, aba: str, ano: int) -> pd.DataFrame:
+        return pd.read_excel(self.arquivo(ano), sheet_name=aba)
+
+    def _gravar(self, planilhas: dict, ano: int):
+        arquivo = self.arquivo(ano)
+        opcoes = {'mode': 'a', 'if_sheet_exists': 'replace'} if arquivo.exists() else {'mode': 'w'}
+        with pd.ExcelWriter(arquivo, engine='openpyxl', **opcoes) as writer:
+            for aba, df in planilhas.items():
+                df.to_excel(writer, index=False, sheet_name=aba)
+
+    def _acrescentar(self, aba: str, linhas: pd.DataFrame, ano: int):
+        # No Excel a aba é relida dentro da trava e regravada
+        self._gravar({aba: pd.concat([self.ler(aba, ano), linhas], ignore_index=True)}, ano)
+
+
+class ArmazenamentoSQLite(_Armazenamento):
+    """Armazenamento em banco SQLite, com uma tabela por aba da planilha.
+
+    A coluna ANO identifica a partição. Filtros e agregações podem ser
+    executados no próprio banco via `consultar`.
+    """
+
+    suporta_consultas = True
+
+    def __init__(self, caminho: Path = SQLITE_PATH):
+        self.caminho = Path(caminho)
+        self._migrado = False
+
+    def __str__(self):
+        return self.caminho.name
+
+    @staticmethod
+    def tabela(aba: str) -> str:
+        return {'Contratos': 'contratos', 'Históricos': 'historicos'}.get(aba, aba)
+
+    def conectar(self):
+        conexao = sqlite3.connect(self.caminho)
+        if not self._migrado:
+            self._migrar(conexao)
+            self._migrado = True
+        return conexao
+
+    @staticmethod
+    def _colunas(conexao, tabela: str) -> list:
+        """Colunas da tabela (lista vazia se ela não existe)."""
+        return [linha[1] for linha in conexao.execute(f'PRAGMA table_info("{tabela}")')]
+
+    def _migrar(self, conexao):
+        """Atualiza bancos criados antes das partições por ano (tabelas sem a coluna ANO).
+
+        Esses bancos vieram da planilha única de ANO_LEGADO; as linhas existentes,
+        inclusive as alteradas depois da importação, passam a pertencer a esse ano.
+        """
+        with conexao:
+            for aba in ABAS:
+                tabela = self.tabela(aba)
+                colunas = self._colunas(conexao, tabela)
+                if colunas and 'ANO' not in colunas:
+                    conexao.execute(f'ALTER TABLE "{tabela}" ADD COLUMN "ANO" INTEGER')
+                    conexao.execute(f'UPDATE "{tabela}" SET "ANO" = ?', (ANO_LEGADO,))
+                    conexao.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabela}_ano" ON "{tabela}" ("ANO")')
+
+    def trava(self, ano: int = None) -> TravaArquivo:
+        # Uma única trava para o banco inteiro
+        return TravaArquivo(self.caminho.with_name(f'.{self.caminho.name}.lock'))
+
+    def existe(self) -> bool:
+        if not self.caminho.exists():
+            return False
+        with closing(self.conectar()) as conexao:
+            return 'ANO' in self._colunas(conexao, self.tabela('Contratos'))
+
+    def anos(self) -> list:
+        if not self.existe():
+            return []
+        return self.consultar('SELECT DISTINCT "ANO" FROM contratos ORDER BY "ANO"')['ANO'].tolist()
+
+    def ler(self, aba: str, ano: int) -> pd.DataFrame:
+        df = self.consultar(f'SELECT * FROM "{self.tabela(aba)}" WHERE "ANO" = ? ORDER BY rowid', (ano,))
+        return df.drop(columns='ANO')
+
+    def consultar(self, sql: str, params=()) -> pd.DataFrame:
+        """Executa uma consulta no banco e retorna o resultado como DataFrame."""
+        with closing(self.conectar()) as conexao:
+            df = pd.read_sql_query(sql, conexao, params=params)
+        for col in COLUNAS_DATA:
+            if col in df.columns:
+                try:
+                    df[col] = pd.to_datetime(df[col])
+                except (ValueError, TypeError):
+                    pass  # Coluna com valores mistos permanece como texto, igual ao Excel
+        return df
+
+    def versao(self, ano: int):
+        """Contador de escritas da partição, mantido na tabela de metadados."""
+        if not self.caminho.exists():
+            return 0
+        with closing(self.conectar()) as conexao:
+            try:
+                linha = conexao.execute("SELECT valor FROM metadados WHERE chave = ?", (f'versao_{ano}',)).fetchone()
+            except sqlite3.OperationalError:
+                return 0
+        return linha[0] if linha else 0
+
+    @staticmethod
+    def _incrementar_versao(conexao, ano: int):
+        conexao.execute("CREATE TABLE IF NOT EXISTS metadados (chave TEXT PRIMARY KEY, valor INTEGER)")
+        conexao.execute(
+            "INSERT INTO metadados (chave, valor) VALUES (?, 1) "
+            "ON CONFLICT(chave) DO UPDATE SET valor = valor + 1",
+            (f'versao_{ano}',)
+        )
+
+    def _inserir(self, conexao, aba: str, linhas: pd.DataFrame, ano: int):
+        tabela = self.tabela(aba)
+        linhas.assign(ANO=ano).to_sql(tabela, conexao, if_exists='append', index=False)
+        conexao.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabela}_ano" ON "{tabela}" ("ANO")')
+
+    def _gravar(self, planilhas: dict, ano: int):
+        # Substitui a partição; a trava de escrita impede gravações intercaladas
+        with closing(self.conectar()) as conexao, conexao:
+            for aba, df in planilhas.items():
+                if self._colunas(conexao, self.tabela(aba)):
+                    conexao.execute(f'DELETE FROM "{self.tabela(aba)}" WHERE "ANO" = ?', (ano,))
+                self._inserir(conexao, aba, df, ano)
+            self._incrementar_versao(conexao, ano)
+
+    def _acrescentar(self, aba: str, linhas: pd.DataFrame, ano: int):
+        # Insere as linhas sem reescrever a tabela
+        with closing(self.conectar()) as conexao, conexao:
+            self._inserir(conexao, aba, linhas, ano)
+            self._incrementar_versao(conexao, ano)
+
+
+def importar_excel(destino: ArmazenamentoSQLite, origem: Path = PASTA_DATASETS):
+    """Importa para o banco todas as planilhas anuais da pasta."""
+    excel = ArmazenamentoExcel(origem)
+    for ano in excel.anos():
+        destino.salvar({aba: excel.ler(aba, ano) for aba in ABAS}, ano)
+
+
+def exportar_excel(origem, destino: Path):
+    """Exporta cada ano do armazenamento para uma planilha AAAA.xlsx na pasta de destino.
+
+    A aba 'Históricos' é gerada a partir do log de alterações do ano.
+    """
+    # Importação tardia: historico.py depende deste módulo
+    from historico import obter_historico
+    excel = ArmazenamentoExcel(destino)
+    for ano in origem.anos():
+        excel.salvar({'Contratos': origem.ler('Contratos', ano), 'Históricos': obter_historico(ano).exportar()}, ano)
+
+
+_armazenamento = None
+
+
+def obter_armazenamento():
+    """Retorna o armazenamento configurado em STORAGE_BACKEND ('excel' ou 'sqlite').
+
+    Na primeira execução com SQLite, o banco é criado a partir das planilhas.
+    """
+    global _armazenamento
+    if _armazenamento is None:
+        if STORAGE_BACKEND.lower() == 'sqlite':
+            armazenamento = ArmazenamentoSQLite()
+            if not armazenamento.existe():
+                importar_excel(armazenamento)
+        else:
+            armazenamento = ArmazenamentoExcel()
+        _armazenamento = armazenamento
+    return _armazenamento
+
+
+if __name__ == '__main__':
+    # Uso: python armazenamento.py importar [pasta_planilhas]
+    #      python armazenamento.py exportar <pasta_destino>
+    if len(sys.argv) < 2 or sys.argv[1] not in ('importar', 'exportar'):
+        sys.exit("Uso: python armazenamento.py importar [pasta_planilhas] | exportar <pasta_destino>")
+    if sys.argv[1] == 'importar':
+        origem = Path(sys.argv[2]) if len(sys.argv) > 2 else PASTA_DATASETS
+        importar_excel(ArmazenamentoSQLite(), origem)
+        print(f"Planilhas de {origem} importadas para {SQLITE_PATH}")
+    else:
+        if len(sys.argv) < 3:
+            sys.exit("Informe a pasta de destino da exportação.")
+        destino = Path(sys.argv[2])
+        destino.mkdir(parents=True, exist_ok=True)
+        exportar_excel(obter_armazenamento(), destino)
+        print(f"Dados exportados para {destino}")
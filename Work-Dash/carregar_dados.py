@@ -1,36 +1,162 @@
 from pathlib import Path
 import streamlit as st
 import pandas as pd
+from armazenamento import obter_armazenamento, ConflitoDeVersao
+from previsao import atualizar_motor, invalidar_motor
+from historico import obter_historico
+from snapshots import agendar_snapshots
+from esquema import ESQUEMA_CONTRATOS, aplicar_esquema, relatorio_memoria, tipos_para_gravacao
+from memoria_sessoes import descartar_objeto, guardar_objeto, obter_objeto, obter_ou_guardar
 
-def leitura_de_dados():
-    """Carrega os dados do Excel e armazena no session_state."""
-    if 'dados' not in st.session_state:
-        # Define o caminho para a pasta 'planilhas'
-        pasta_datasets = Path(__file__).resolve().parent / 'planilhas'  # Ajuste aqui
-        
-        # Verifica se o arquivo existe
-        if not (pasta_datasets / '2024.xlsx').exists():
-            st.error("Arquivo '2024.xlsx' não encontrado na pasta 'planilhas'.")
-            return
-        
+# O histórico de alterações fica no log de historico.py e não é carregado aqui
+ESQUEMAS = {'df_contratos': ESQUEMA_CONTRATOS}
+
+def anos_disponiveis() -> list:
+    """Anos (partições) disponíveis no armazenamento configurado."""
+    return obter_armazenamento().anos()
+
+def leitura_de_dados(anos=None):
+    """Carrega os dados dos anos informados e os guarda como objetos da sessão.
+
+    Cada ano é uma partição lida sob demanda; anos fora da seleção são
+    descartados da sessão. Sem `anos` (None), carrega o ano mais recente; uma
+    lista vazia resulta em tabelas vazias. Uma partição só é relida quando sua
+    versão no armazenamento muda (ex.: outra sessão salvou alterações) ou
+    quando a partição foi liberada por falta de memória.
+    """
+    armazenamento = obter_armazenamento()
+
+    # Verifica se há planilhas
+    disponiveis = armazenamento.anos()
+    if not disponiveis:
+        st.error(f"Nenhuma planilha '{armazenamento}' encontrada na pasta 'planilhas'.")
+        return
+
+    # Seleção vazia não carrega nenhum ano, como nas consultas do banco
+    anos = sorted(ano for ano in (disponiveis[-1:] if anos is None else anos) if ano in disponiveis)
+    particoes = obter_ou_guardar('particoes', {})
+    versoes = st.session_state.setdefault('versoes_dados', {})
+
+    # Poda: só os anos selecionados permanecem em memória
+    for ano in list(particoes):
+        if ano not in anos:
+            del particoes[ano]
+            versoes.pop(ano, None)
+            obter_objeto('relatorio_memoria', {}).pop(ano, None)
+
+    recarregou = False
+    for ano in anos:
+        versao = armazenamento.versao(ano)
+        if ano in particoes and versoes.get(ano) == versao:
+            continue
         try:
-            # Carrega os DataFrames
-            df_contratos = pd.read_excel(pasta_datasets / '2024.xlsx', sheet_name='Contratos')
-            df_historico = pd.read_excel(pasta_datasets / '2024.xlsx', sheet_name='Históricos')
+            # Carrega os DataFrames da partição
+            brutos = {
+                'df_contratos': armazenamento.ler('Contratos', ano)
+            }
         except Exception as e:
-            st.error(f"Erro ao carregar os dados: {e}")
+            st.error(f"Erro ao carregar os dados de {ano}: {e}")
             return
-        
-        # Armazena os dados no session_state
+
+        # Aplica os tipos compactos e guarda o comparativo de memória
+        particoes[ano] = {chave: aplicar_esquema(df, ESQUEMAS[chave]) for chave, df in brutos.items()}
+        obter_ou_guardar('relatorio_memoria', {})[ano] = {
+            chave: relatorio_memoria(brutos[chave], particoes[ano][chave]) for chave in brutos
+        }
+        versoes[ano] = versao
+        recarregou = True
+
+    if not recarregou and obter_objeto('dados') is not None and st.session_state.get('anos_dados') == anos:
+        return
+
+    if not anos:
+        # Nenhum ano: tabelas vazias com as colunas do esquema
+        dados = {
+            chave: aplicar_esquema(pd.DataFrame(columns=['CONTRATO Nº', *esquema]), esquema)
+            for chave, esquema in ESQUEMAS.items()
+        }
+    elif len(anos) == 1:
+        # Um único ano: a sessão trabalha diretamente sobre a partição
+        dados = particoes[anos[0]]
+    else:
+        # Categorias diferentes entre anos viram texto no concat; o esquema é reaplicado
         dados = {
-            'df_contratos': df_contratos,
-            'df_historico': df_historico
+            chave: aplicar_esquema(pd.concat([particoes[ano][chave] for ano in anos], ignore_index=True), esquema)
+            for chave, esquema in ESQUEMAS.items()
         }
-        
-        st.session_state['caminho_datasets'] = pasta_datasets
-        st.session_state['dados'] = dados
-
-def save_to_excel(df, file_path, sheet_name='Contratos'):
-    """Salva o DataFrame no arquivo Excel."""
-    with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
+
+    # Os DataFrames ficam nos objetos da sessão; o session_state guarda só os anos
+    st.session_state['caminho_datasets'] = Path(__file__).resolve().parent / 'planilhas'
+    guardar_objeto('dados', dados)
+    st.session_state['anos_dados'] = anos
+
+def _ano_atual(ano=None) -> int:
+    """Ano da escrita: o informado ou o único ano carregado na sessão."""
+    if ano is not None:
+        return ano
+    anos = st.session_state.get('anos_dados', [])
+    if len(anos) != 1:
+        raise ValueError("Selecione um único ano para alterar os dados.")
+    return anos[0]
+
+def invalidar_dados():
+    """Descarta os dados da sessão para que sejam relidos na próxima execução."""
+    for chave in ('dados', 'particoes', 'relatorio_memoria'):
+        descartar_objeto(chave)
+    for chave in ('versoes_dados', 'anos_dados'):
+        st.session_state.pop(chave, None)
+
+def save_to_excel(df, file_path=None, sheet_name='Contratos', ano=None):
+    """Salva o DataFrame na partição do ano no armazenamento configurado.
+
+    `file_path` é mantido por compatibilidade; o destino vem de STORAGE_BACKEND.
+    """
+    salvar_planilhas({sheet_name: df}, ano=ano)
+
+def _registrar_historico(ano: int, historico):
+    """Função que acrescenta as entradas ao log do ano, chamada logo após a escrita."""
+    if historico is None:
+        return None
+    return lambda: obter_historico(ano).registrar(historico)
+
+def salvar_planilhas(planilhas: dict, file_path=None, ano=None, removidas=None, historico=None):
+    """Salva várias abas ({nome_da_aba: DataFrame}) da partição em uma única escrita.
+
+    Se a aba de contratos for salva com `removidas` (linhas excluídas), os
+    modelos de previsão são atualizados de forma incremental; sem isso, são
+    reconstruídos na próxima consulta. Alterações nos contratos também
+    regeneram os snapshots do painel em segundo plano. As entradas de
+    `historico` (CONTRATO Nº, AÇÃO, DATA) são registradas ainda dentro da
+    trava da escrita, antes de a função retornar.
+
+    Levanta ConflitoDeVersao se outra sessão alterou os dados desde a leitura.
+    """
+    ano = _ano_atual(ano)
+    versoes = st.session_state.setdefault('versoes_dados', {})
+    anterior = versoes.get(ano)
+    planilhas = {aba: tipos_para_gravacao(df) for aba, df in planilhas.items()}
+    versoes[ano] = obter_armazenamento().salvar(
+        planilhas, ano, versao_esperada=anterior, ao_gravar=_registrar_historico(ano, historico)
+    )
+
+    if 'Contratos' in planilhas and removidas is None:
+        invalidar_motor(ano)
+    else:
+        atualizar_motor(ano, anterior, versoes[ano], removidas=removidas)
+
+    if 'Contratos' in planilhas:
+        agendar_snapshots(ano)
+
+def anexar_linhas(linhas: pd.DataFrame, sheet_name: str, ano=None, historico=None):
+    """Acrescenta linhas a uma aba da partição; no banco, sem reescrever a tabela."""
+    ano = _ano_atual(ano)
+    anterior, nova = obter_armazenamento().anexar(
+        sheet_name, tipos_para_gravacao(linhas), ano, ao_gravar=_registrar_historico(ano, historico)
+    )
+    atualizar_motor(ano, anterior, nova, adicionadas=linhas if sheet_name == 'Contratos' else None)
+    if sheet_name == 'Contratos':
+        agendar_snapshots(ano)
+    # Se outra sessão escreveu antes, mantém a versão antiga para recarregar depois
+    versoes = st.session_state.setdefault('versoes_dados', {})
+    if versoes.get(ano) == anterior:
+        versoes[ano] = nova
@@ -0,0 +1,134 @@
+"""Clientes OpenAI compartilhados pelo processo.
+
+Todos os clientes (validação da chave, chat e embeddings) usam um único
+httpx.Client com pool de conexões e keep-alive, de modo que sessões e
+tarefas reaproveitam as conexões TLS já abertas. Os clientes ficam em um
+registro indexado por (impressão da chave, modelo); a chave em si não é
+guardada como índice.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict, deque
+import httpx
+import openai
+from langchain_openai.chat_models import ChatOpenAI
+from langchain_openai.embeddings import OpenAIEmbeddings
+from configs import LIMITE_CONEXOES_HTTP, CONEXOES_KEEPALIVE_HTTP, EXPIRACAO_KEEPALIVE_HTTP, TIMEOUT_HTTP
+
+MAX_AMOSTRAS_LATENCIA = 500
+
+
+def impressao_chave(api_key: str) -> str:
+    """Identificador curto e não reversível da chave."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+class EstatisticasHTTP:
+    """Requisições, conexões novas e latência por rota do cliente compartilhado."""
+
+    def __init__(self):
+        self.requisicoes = 0
+        self.conexoes_novas = 0
+        self._latencias = defaultdict(lambda: deque(maxlen=MAX_AMOSTRAS_LATENCIA))
+        self._lock = threading.Lock()
+
+    def _rastrear(self, evento: str, info: dict):
+        # Evento emitido pelo httpcore apenas quando uma conexão TCP é aberta
+        if evento == 'connection.connect_tcp.complete':
+            with self._lock:
+                self.conexoes_novas += 1
+
+    def ao_enviar(self, request: httpx.Request):
+        request.extensions['trace'] = self._rastrear
+        request.extensions['inicio'] = time.perf_counter()
+
+    def ao_receber(self, response: httpx.Response):
+        inicio = response.request.extensions.get('inicio')
+        rota = response.request.url.path.rsplit('/v1', 1)[-1] or '/'
+        with self._lock:
+            self.requisicoes += 1
+            if inicio is not None:
+                self._latencias[rota].append(time.perf_counter() - inicio)
+
+    def resumo(self) -> dict:
+        with self._lock:
+            rotas = {}
+            for rota, amostras in self._latencias.items():
+                ordenadas = sorted(amostras)
+                rotas[rota] = {
+                    'requisicoes': len(ordenadas),
+                    'p50_ms': round(ordenadas[len(ordenadas) // 2] * 1000, 1),
+                    'p95_ms': round(ordenadas[min(int(len(ordenadas) * 0.95), len(ordenadas) - 1)] * 1000, 1),
+                }
+            reaproveitadas = max(self.requisicoes - self.conexoes_novas, 0)
+            return {
+                'requisicoes': self.requisicoes,
+                'conexoes_novas': self.conexoes_novas,
+                'reaproveitamento': reaproveitadas / self.requisicoes if self.requisicoes else 0.0,
+                'rotas': rotas,
+            }
+
+
+estatisticas = EstatisticasHTTP()
+_http = None
+_clientes = {}
+_chaves_validas = set()
+_lock = threading.Lock()
+
+
+def cliente_http() -> httpx.Client:
+    """Cliente HTTP único do processo, com pool e keep-alive."""
+    global _http
+    with _lock:
+        if _http is None:
+            _http = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=LIMITE_CONEXOES_HTTP,
+                    max_keepalive_connections=CONEXOES_KEEPALIVE_HTTP,
+                    keepalive_expiry=EXPIRACAO_KEEPALIVE_HTTP,
+                ),
+                timeout=httpx.Timeout(TIMEOUT_HTTP, connect=10.0),
+                event_hooks={'request': [estatisticas.ao_enviar], 'response': [estatisticas.ao_receber]},
+            )
+        return _http
+
+
+def _obter(chave: tuple, criar):
+    with _lock:
+        cliente = _clientes.get(chave)
+    if cliente is None:
+        cliente = criar()
+        with _lock:
+            cliente = _clientes.setdefault(chave, cliente)
+    return cliente
+
+
+def cliente_openai(api_key: str) -> openai.OpenAI:
+    return _obter(
+        ('openai', impressao_chave(api_key), None),
+        lambda: openai.OpenAI(api_key=api_key, http_client=cliente_http())
+    )
+
+
+def modelo_chat(api_key: str, modelo: str, temperatura: float = 0.3) -> ChatOpenAI:
+    return _obter(
+        ('chat', impressao_chave(api_key), modelo, temperatura),
+        lambda: ChatOpenAI(model=modelo, api_key=api_key, temperature=temperatura, http_client=cliente_http())
+    )
+
+
+def modelo_embeddings(api_key: str, modelo: str = 'text-embedding-ada-002', **kwargs) -> OpenAIEmbeddings:
+    return _obter(
+        ('embeddings', impressao_chave(api_key), modelo, tuple(sorted(kwargs.items()))),
+        lambda: OpenAIEmbeddings(model=modelo, api_key=api_key, http_client=cliente_http(), **kwargs)
+    )
+
+
+def chave_validada(api_key: str) -> bool:
+    """Valida a chave uma única vez por processo (lista os modelos)."""
+    impressao = impressao_chave(api_key)
+    if impressao not in _chaves_validas:
+        cliente_openai(api_key).models.list()
+        _chaves_validas.add(impressao)
+    return True
@@ -1,9 +1,35 @@
+import os
 import streamlit as st
+from pathlib import Path
 
 # Configurações do modelo e parâmetros de recuperação
 MODEL_NAME = 'gpt-3.5-turbo-0125'
 RETRIEVAL_SEARCH_TYPE = 'mmr'
 RETRIEVAL_KWARGS = {"k": 5, "fetch_k": 20}
+
+# Parâmetros extras do modelo de embeddings (ex.: servidor local no modo em lote)
+EMBEDDING_KWARGS = {}
+
+# Orçamento de tokens do contexto enviado ao modelo (trechos recuperados)
+CONTEXT_TOKEN_BUDGET = 1200
+
+# Armazenamento dos contratos: 'excel' (planilhas/2024.xlsx) ou 'sqlite'
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'excel')
+SQLITE_PATH = Path(__file__).resolve().parent / 'planilhas' / 'contratos.db'
+
+# Cliente HTTP compartilhado pelos clientes OpenAI do processo
+LIMITE_CONEXOES_HTTP = 20
+CONEXOES_KEEPALIVE_HTTP = 10
+EXPIRACAO_KEEPALIVE_HTTP = 60.0
+TIMEOUT_HTTP = 60.0
+
+# Memória das sessões: acima do orçamento, sessões ociosas liberam os dados pesados
+ORCAMENTO_MEMORIA_SESSOES_MB = float(os.getenv('ORCAMENTO_MEMORIA_SESSOES_MB', '512'))
+OCIOSIDADE_SESSAO_S = 300
+
+# Indexação em segundo plano
+MAX_WORKERS_INDEXACAO = 2
+TAMANHO_LOTE_EMBEDDINGS = 64
 PROMPT = '''Você é um Chatbot amigável que auxilia na interpretação 
 de documentos que lhe são fornecidos. 
 No contexto fornecido estão as informações dos documentos do usuário. 
@@ -19,11 +45,12 @@ Conversa atual:
 Human: {question}
 AI: '''
 
-def get_config(config_name: str):
+def get_config(config_name: str, default=None):
     """Obtém a configuração especificada.
 
     Args:
         config_name (str): Nome da configuração a ser obtida.
+        default: Valor retornado se a configuração não existir.
 
     Returns:
         str: Valor da configuração.
@@ -38,3 +65,12 @@ def get_config(config_name: str):
         return RETRIEVAL_KWARGS
     elif config_name.lower() == 'prompt':
         return PROMPT
+    elif config_name.lower() == 'embedding_kwargs':
+        return EMBEDDING_KWARGS
+    elif config_name.lower() == 'context_token_budget':
+        return CONTEXT_TOKEN_BUDGET
+    elif config_name.lower() == 'max_workers_indexacao':
+        return MAX_WORKERS_INDEXACAO
+    elif config_name.lower() == 'tamanho_lote_embeddings':
+        return TAMANHO_LOTE_EMBEDDINGS
+    return default
@@ -0,0 +1,125 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from configs import CONTEXT_TOKEN_BUDGET
+
+# Palavras muito frequentes que não indicam relevância
+STOPWORDS = {
+    'a', 'à', 'ao', 'aos', 'as', 'às', 'com', 'como', 'da', 'das', 'de', 'do', 'dos',
+    'e', 'é', 'em', 'entre', 'era', 'essa', 'esse', 'esta', 'este', 'eu', 'foi', 'há',
+    'isso', 'já', 'mais', 'mas', 'me', 'na', 'nas', 'no', 'nos', 'não', 'o', 'os', 'ou',
+    'para', 'pela', 'pelo', 'por', 'qual', 'quais', 'que', 'quem', 'se', 'sem', 'ser',
+    'seu', 'sobre', 'sua', 'são', 'também', 'um', 'uma', 'the', 'of', 'and', 'to', 'in',
+}
+PADRAO_PALAVRA = re.compile(r'\w+', re.UNICODE)
+PADRAO_SENTENCA = re.compile(r'(?<=[.!?;])\s+|\n+')
+# Metadado dos trechos com o relatório de tokens da consulta
+CHAVE_RELATORIO = 'relatorio_contexto'
+
+
+def termos(texto: str) -> list:
+    """Palavras relevantes do texto, em minúsculas."""
+    return [p for p in PADRAO_PALAVRA.findall(texto.lower()) if p not in STOPWORDS and len(p) > 1]
+
+
+def pontuar(termos_consulta: set, texto: str) -> float:
+    """Sobreposição léxica entre consulta e texto, normalizada pelo tamanho do texto."""
+    contagem = Counter(termos(texto))
+    if not contagem:
+        return 0.0
+    acertos = sum(1 + math.log(contagem[t]) for t in termos_consulta if t in contagem)
+    return acertos / math.sqrt(sum(contagem.values()))
+
+
+@lru_cache(maxsize=None)
+def contador_tokens(modelo: str):
+    """Retorna uma função que conta tokens; usa tiktoken se disponível."""
+    try:
+        import tiktoken
+        codificador = tiktoken.encoding_for_model(modelo)
+        return lambda texto: len(codificador.encode(texto))
+    except Exception:
+        # Aproximação usual: ~4 caracteres por token
+        return lambda texto: math.ceil(len(texto) / 4)
+
+
+def montar_contexto(consulta: str, documentos: list, orcamento_tokens: int, contar) -> tuple:
+    """Reordena os trechos, extrai as sentenças relevantes e respeita o orçamento.
+
+    Returns:
+        tuple: (documentos reduzidos, relatório de tokens)
+    """
+    termos_consulta = set(termos(consulta))
+    tokens_originais = sum(contar(doc.page_content) for doc in documentos)
+
+    # Reordena os trechos pela relevância léxica (estável para empates)
+    ordenados = sorted(documentos, key=lambda doc: pontuar(termos_consulta, doc.page_content), reverse=True)
+
+    selecionados = []
+    tokens_usados = 0
+    for posicao, doc in enumerate(ordenados):
+        # Sentenças únicas, na ordem original do trecho
+        sentencas = list(dict.fromkeys(s.strip() for s in PADRAO_SENTENCA.split(doc.page_content) if s.strip()))
+        relevantes = [s for s in sentencas if termos_consulta & set(termos(s))]
+        if not relevantes:
+            # O trecho mais bem colocado é mantido inteiro se nenhuma sentença casar
+            if posicao > 0:
+                continue
+            relevantes = sentencas
+
+        mantidas = []
+        for sentenca in relevantes:
+            tokens = contar(sentenca)
+            if tokens_usados + tokens > orcamento_tokens:
+                continue  # Sentenças menores, adiante, ainda podem caber
+            mantidas.append(sentenca)
+            tokens_usados += tokens
+        if mantidas:
+            selecionados.append(Document(page_content=' '.join(mantidas), metadata=dict(doc.metadata)))
+        if tokens_usados >= orcamento_tokens:
+            break
+
+    relatorio = {
+        'trechos_recuperados': len(documentos),
+        'trechos_usados': len(selecionados),
+        'tokens_originais': tokens_originais,
+        'tokens_enviados': tokens_usados,
+        'tokens_economizados': max(tokens_originais - tokens_usados, 0),
+    }
+    return selecionados, relatorio
+
+
+def relatorio_da_resposta(resposta: dict):
+    """Relatório de tokens da consulta que gerou a resposta da cadeia, se houver."""
+    for doc in resposta.get('source_documents', []) if isinstance(resposta, dict) else []:
+        if CHAVE_RELATORIO in doc.metadata:
+            return doc.metadata[CHAVE_RELATORIO]
+    return None
+
+
+class RetrieverComOrcamento(BaseRetriever):
+    """Envolve um retriever e monta o contexto dentro de um orçamento de tokens.
+
+    Entre a recuperação e o prompt: reordena os trechos por sobreposição
+    léxica com a pergunta, mantém apenas as sentenças relevantes e corta no
+    orçamento. O relatório de cada consulta vai nos metadados dos próprios
+    trechos (ver relatorio_da_resposta), sem estado compartilhado entre
+    chamadas concorrentes.
+    """
+
+    retriever: BaseRetriever
+    orcamento_tokens: int = CONTEXT_TOKEN_BUDGET
+    modelo: str = 'gpt-3.5-turbo'
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list:
+        documentos = self.retriever.invoke(query, config={'callbacks': run_manager.get_child()})
+        selecionados, relatorio = montar_contexto(
+            query, documentos, self.orcamento_tokens, contador_tokens(self.modelo)
+        )
+        for doc in selecionados:
+            doc.metadata[CHAVE_RELATORIO] = relatorio
+        return selecionados
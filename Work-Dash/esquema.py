@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Ordem cronológica dos meses, usada nos gráficos e no tipo ordenado de MÊS
+MESES = ['JANEIRO', 'FEVEREIRO', 'MARÇO', 'ABRIL', 'MAIO', 'JUNHO',
+         'JULHO', 'AGOSTO', 'SETEMBRO', 'OUTUBRO', 'NOVEMBRO', 'DEZEMBRO']
+
+CATEGORIA = 'category'
+MES = 'mes'
+DINHEIRO = 'dinheiro'
+
+# Tipos declarados por coluna, aplicados na carga das abas
+ESQUEMA_CONTRATOS = {
+    'EMPRESA': CATEGORIA,
+    'SISTEMA': CATEGORIA,
+    'MÊS': MES,
+    'ÍNDICE': CATEGORIA,
+    'PEDIDO/ORDEM DE COMPRAS': CATEGORIA,
+    'STATUS / AÇÃO': CATEGORIA,
+    'VALOR PAGO': DINHEIRO,
+    'VALOR REAJUSTADO': DINHEIRO,
+    'DIFERENÇA DE VALOR DE CONTRATO': DINHEIRO,
+}
+ESQUEMA_HISTORICO = {
+    'AÇÃO': CATEGORIA,
+}
+
+# Maior erro aceito ao reduzir valores monetários para float32 (meio centavo),
+# tanto em cada valor quanto no total da coluna
+TOLERANCIA_DINHEIRO = 0.005
+
+
+def ordenar_meses(meses) -> list:
+    """Ordena os meses cronologicamente; valores fora de MESES vão para o fim."""
+    return sorted(meses, key=lambda mes: (MESES.index(mes) if mes in MESES else len(MESES), str(mes)))
+
+
+def _tipo_mes(serie: pd.Series) -> pd.CategoricalDtype:
+    # Grafias fora do padrão (ex.: 'Outubro') são mantidas como categorias extras
+    extras = sorted(set(serie.dropna().astype(str)) - set(MESES))
+    return pd.CategoricalDtype(MESES + extras, ordered=True)
+
+
+def _dinheiro(serie: pd.Series) -> pd.Series:
+    """Reduz a coluna monetária a float32 quando isso preserva os centavos; inteiros ficam em int64."""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    if numeros.isna().sum() > serie.isna().sum():
+        return serie  # Há textos não numéricos; mantém a coluna como está
+    if pd.api.types.is_integer_dtype(numeros):
+        # Sem redução para int8/int16: valores editados depois podem não caber no tipo
+        return numeros.astype(np.int64)
+    # float32 só é usado se nem os valores nem o total perderem centavos
+    compacto = numeros.astype(np.float32)
+    diferenca = compacto.astype(np.float64) - numeros
+    if diferenca.abs().max() > TOLERANCIA_DINHEIRO or abs(diferenca.sum()) > TOLERANCIA_DINHEIRO:
+        return numeros
+    return compacto
+
+
+def aplicar_esquema(df: pd.DataFrame, esquema: dict) -> pd.DataFrame:
+    """Converte as colunas presentes no DataFrame para os tipos declarados."""
+    df = df.copy()
+    for coluna, tipo in esquema.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == CATEGORIA:
+            df[coluna] = df[coluna].astype(CATEGORIA)
+        elif tipo == MES:
+            df[coluna] = df[coluna].astype(_tipo_mes(df[coluna]))
+        elif tipo == DINHEIRO:
+            df[coluna] = _dinheiro(df[coluna])
+    return df
+
+
+def relatorio_memoria(antes: pd.DataFrame, depois: pd.DataFrame) -> pd.DataFrame:
+    """Compara o uso de memória por coluna antes e depois da aplicação do esquema."""
+    relatorio = pd.DataFrame({
+        'TIPO ANTES': antes.dtypes.astype(str),
+        'TIPO DEPOIS': depois.dtypes.astype(str),
+        'BYTES ANTES': antes.memory_usage(deep=True, index=False),
+        'BYTES DEPOIS': depois.memory_usage(deep=True, index=False),
+    })
+    relatorio.loc['TOTAL'] = ['', '', relatorio['BYTES ANTES'].sum(), relatorio['BYTES DEPOIS'].sum()]
+    relatorio['REDUÇÃO (%)'] = (
+        (1 - relatorio['BYTES DEPOIS'] / relatorio['BYTES ANTES'].where(relatorio['BYTES ANTES'] > 0)) * 100
+    ).round(1)
+    return relatorio
+
+
+def tipos_para_gravacao(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte colunas float32 de volta para float64 antes de gravar.
+
+    A conversão passa pela representação decimal mais curta do float32, o que
+    recupera o valor original (ex.: 478.6558) em vez de 478.65579223632810.
+    """
+    colunas = [col for col in df.columns if df[col].dtype == np.float32]
+    if not colunas:
+        return df
+    return df.astype({col: str for col in colunas}).astype({col: np.float64 for col in colunas})
@@ -0,0 +1,207 @@
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.express as px
+import numpy as np
+from esquema import MESES
+from previsao import GERAL
+
+# Função para formatar valores no formato brasileiro
+def format_currency(value):
+    return f"R${value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+# Funções de plotagem
+def plot_value_acrescentado(df):
+    df['ACRESCIMO_REAJUSTE'] = df['VALOR REAJUSTADO'] - df['VALOR PAGO']
+    month_order = MESES
+    df['MÊS'] = pd.Categorical(df['MÊS'], categories=month_order, ordered=True)
+    monthly_acrescimento = df.groupby('MÊS', observed=True).agg({'ACRESCIMO_REAJUSTE': 'sum'}).reset_index()
+    monthly_acrescimento = monthly_acrescimento.sort_values('MÊS')
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=monthly_acrescimento['MÊS'],
+        y=monthly_acrescimento['ACRESCIMO_REAJUSTE'],
+        mode='lines+markers+text',
+        line=dict(color='darkblue', width=2, shape='spline'),
+        text=monthly_acrescimento['ACRESCIMO_REAJUSTE'],
+        texttemplate='%{text:.2s}',
+        textposition='top center',
+        marker=dict(symbol='circle', size=8, color='royalblue')
+    ))
+
+    total_acrescimo = monthly_acrescimento['ACRESCIMO_REAJUSTE'].sum()
+    fig.add_annotation(
+        text=f"Total Acréscimo: {format_currency(total_acrescimo)}",
+        xref="paper", yref="paper",
+        x=0.5, y=1.1, showarrow=False,
+        font=dict(size=18, color="white")
+    )
+
+    fig.update_layout(
+        title="Acréscimo no Reajuste por Mês",
+        xaxis_title='Mês',
+        yaxis_title='Valor Acrescentado (R$)',
+        showlegend=False,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            showline=False, showgrid=False, zeroline=False,
+            categoryorder='array', categoryarray=month_order
+        ),
+        yaxis=dict(showline=False, showgrid=False, zeroline=False)
+    )
+
+    return fig
+
+def plot_index_analysis(df):
+    index_summary = df.groupby('ÍNDICE', observed=True).agg({
+        'VALOR PAGO': 'mean',
+        'VALOR REAJUSTADO': 'mean'
+    }).reset_index()
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=index_summary['ÍNDICE'],
+        y=index_summary['VALOR PAGO'],
+        name='Valor Pago',
+        marker_color='lightcyan'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=index_summary['ÍNDICE'],
+        y=index_summary['VALOR REAJUSTADO'],
+        name='Valor Reajustado',
+        mode='lines+markers',
+        line=dict(color='darkblue', width=2),
+    ))
+
+    fig.update_layout(
+        title="Percentual de Indice de Reajuste",
+        xaxis=dict(showline=False, showgrid=False, zeroline=False),
+        yaxis=dict(showline=False, showgrid=False, zeroline=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+    
+    return fig
+
+def plot_contracts_per_month(df):
+    contracts_per_month = df.groupby('MÊS', observed=True).size().reset_index(name='TOTAL DE CONTRATOS')
+    months_order = MESES
+    contracts_per_month['MÊS'] = pd.Categorical(contracts_per_month['MÊS'], categories=months_order, ordered=True)
+    contracts_per_month = contracts_per_month.sort_values('MÊS')
+
+    fig = px.bar(contracts_per_month, x='MÊS', y='TOTAL DE CONTRATOS',
+                 labels={'TOTAL DE CONTRATOS': 'Total de Contratos', 'MÊS': 'Mês'},
+                 color='TOTAL DE CONTRATOS',
+                 color_discrete_sequence=['royalblue'])
+
+    fig.update_traces(texttemplate='%{y}', textposition='outside')
+
+    fig.update_layout(
+        title="Total de Contratos por Mês",
+        xaxis=dict(showline=False, showgrid=False, zeroline=False),
+        yaxis=dict(showline=False, showgrid=False, zeroline=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+
+    return fig
+
+def plot_pie_chart(df):
+    status_counts = df['STATUS / AÇÃO'].value_counts().reset_index()
+    status_counts.columns = ['STATUS / AÇÃO', 'COUNT']
+
+    fig = go.Figure(go.Pie(
+        labels=status_counts['STATUS / AÇÃO'],
+        values=status_counts['COUNT'],
+        hole=0.5,
+        marker=dict(colors=['royalblue', 'darkblue', 'lightcyan']),
+        textinfo='none'
+    ))
+
+    fig.update_layout(
+        title="Distribuição por Status",
+        annotations=[dict(text=f'Total: {status_counts["COUNT"].sum()}', x=0.5, y=0.5, font_size=18, showarrow=False)]
+    )
+
+    return fig
+
+def plot_regression_chart(df, motor):
+    df['DIFERENÇA'] = df['VALOR REAJUSTADO'] - df['VALOR PAGO']
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=df['VALOR PAGO'],
+        y=df['DIFERENÇA'],
+        mode='markers',
+        name='Diferença Observada',
+        marker=dict(color='royalblue', size=10, opacity=0.6),
+        text=[f"Contrato: {row['CONTRATO Nº']}, Empresa: {row['EMPRESA']}" for idx, row in df.iterrows()]
+    ))
+
+    # A reta e a faixa usam só os contratos exibidos, como os pontos do gráfico
+    motor = motor.restrito(df['CONTRATO Nº'].astype(str))
+    geral = motor.modelos[GERAL]
+    if not df.empty and geral.coeficientes() is not None:
+        x = np.linspace(df['VALOR PAGO'].min(), df['VALOR PAGO'].max(), 50)
+        faixa = [geral.intervalo(valor) for valor in x]
+
+        # Faixa de confiança de 95% da reta estimada
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([x, x[::-1]]),
+            y=[sup for _, sup in faixa] + [inf for inf, _ in faixa][::-1],
+            fill='toself',
+            fillcolor='rgba(65,105,225,0.15)',
+            line=dict(width=0),
+            hoverinfo='skip',
+            name='Faixa de Confiança (95%)'
+        ))
+
+        fig.add_trace(go.Scatter(
+            x=x,
+            y=[geral.prever(valor) for valor in x],
+            mode='lines',
+            name='Diferença Estimada',
+            line=dict(color='darkblue', width=2)
+        ))
+
+        # Um modelo por índice, exibido ao clicar na legenda
+        for indice in df['ÍNDICE'].dropna().unique():
+            modelo = motor.modelos.get(str(indice))
+            if modelo is None or modelo.coeficientes() is None:
+                continue
+            fig.add_trace(go.Scatter(
+                x=x,
+                y=[modelo.prever(valor) for valor in x],
+                mode='lines',
+                name=f'Estimada ({indice})',
+                line=dict(width=1, dash='dash'),
+                visible='legendonly'
+            ))
+
+    fig.update_layout(
+        title="Diferença de Valor em Relação ao Valor Pago",
+        xaxis_title="Valor Pago",
+        yaxis_title="Diferença de Valor",
+        xaxis=dict(showline=True, showgrid=False, zeroline=False),
+        yaxis=dict(showline=True, showgrid=False, zeroline=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+
+    return fig
+
+def gerar_figuras(df, motor) -> dict:
+    """Gera os gráficos do painel para os contratos agrupados e filtrados."""
+    df = df.copy()
+    return {
+        'acrescimo': plot_value_acrescentado(df),
+        'status': plot_pie_chart(df),
+        'regressao': plot_regression_chart(df, motor),
+        'contratos_mes': plot_contracts_per_month(df),
+        'indices': plot_index_analysis(df),
+    }
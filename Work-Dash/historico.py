@@ -0,0 +1,284 @@
+"""Histórico de alterações em log somente de acréscimo, segmentado por tempo.
+
+Cada ano (partição) tem sua pasta em planilhas/historico/AAAA/, com:
+
+- segmentos diários (AAAA-MM-DD.jsonl) do mês corrente, onde as novas
+  entradas são acrescentadas sem reescrever nada;
+- segmentos mensais (AAAA-MM.jsonl) criados pela compactação, que junta os
+  segmentos diários de meses encerrados em um arquivo ordenado por data,
+  com o índice salvo ao lado (AAAA-MM.idx.json).
+
+O índice de cada segmento guarda, por linha, a posição no arquivo e a data,
+além das linhas de cada CONTRATO Nº. A consulta filtra e pagina pelo índice
+e lê do disco apenas as linhas da página exibida.
+
+Uso: python historico.py compactar [ano ...]
+"""
+import json
+import re
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+from armazenamento import PASTA_DATASETS, TravaArquivo, obter_armazenamento
+from esquema import ESQUEMA_HISTORICO, aplicar_esquema
+
+PASTA_HISTORICO = PASTA_DATASETS / 'historico'
+PADRAO_DIARIO = re.compile(r'^(\d{4}-\d{2})-\d{2}\.jsonl$')
+PADRAO_MENSAL = re.compile(r'^\d{4}-\d{2}\.jsonl$')
+COLUNAS = ['CONTRATO Nº', 'AÇÃO', 'DATA']
+
+
+def _registro(contrato, acao, data) -> dict:
+    data = pd.Timestamp(data) if not pd.isna(data) else None
+    return {
+        'CONTRATO Nº': str(contrato).strip(),
+        'AÇÃO': str(acao),
+        'DATA': data.isoformat(timespec='milliseconds') if data is not None else '',
+    }
+
+
+def _linha(registro: dict) -> bytes:
+    return (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class IndiceSegmento:
+    """Posição, data e contrato de cada linha de um segmento.
+
+    Como o segmento só cresce, o índice é estendido lendo apenas os bytes
+    acrescentados desde a última atualização.
+    """
+
+    def __init__(self):
+        self.tamanho = 0
+        self.posicoes = []
+        self.datas = []
+        self.contratos = {}
+
+    def atualizar(self, caminho: Path):
+        with open(caminho, 'rb') as arquivo:
+            arquivo.seek(self.tamanho)
+            for linha in arquivo:
+                if not linha.endswith(b'\n'):
+                    break  # Linha ainda em escrita
+                registro = json.loads(linha)
+                self.contratos.setdefault(registro['CONTRATO Nº'], []).append(len(self.posicoes))
+                self.posicoes.append(self.tamanho)
+                self.datas.append(registro['DATA'])
+                self.tamanho += len(linha)
+
+    def para_dict(self) -> dict:
+        return {'tamanho': self.tamanho, 'posicoes': self.posicoes, 'datas': self.datas, 'contratos': self.contratos}
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> 'IndiceSegmento':
+        indice = cls()
+        indice.tamanho = dados['tamanho']
+        indice.posicoes = dados['posicoes']
+        indice.datas = dados['datas']
+        indice.contratos = dados['contratos']
+        return indice
+
+
+class HistoricoAlteracoes:
+    """Log de alterações de um ano, com acréscimo, compactação e consulta paginada."""
+
+    def __init__(self, pasta: Path):
+        self.pasta = Path(pasta)
+        self._indices = {}
+        self._lock = threading.Lock()
+
+    def trava(self) -> TravaArquivo:
+        return TravaArquivo(self.pasta / '.historico.lock')
+
+    def segmentos(self) -> list:
+        """Segmentos mensais e diários do log."""
+        return sorted(
+            caminho for caminho in self.pasta.glob('*.jsonl')
+            if PADRAO_DIARIO.match(caminho.name) or PADRAO_MENSAL.match(caminho.name)
+        )
+
+    def registrar(self, registros: pd.DataFrame):
+        """Acrescenta entradas (CONTRATO Nº, AÇÃO, DATA) ao segmento do dia de cada uma."""
+        por_dia = {}
+        agora = datetime.now()
+        for contrato, acao, data in zip(
+            registros['CONTRATO Nº'], registros['AÇÃO'],
+            registros['DATA'] if 'DATA' in registros.columns else [agora] * len(registros)
+        ):
+            registro = _registro(contrato, acao, data)
+            dia = registro['DATA'][:10] or agora.strftime('%Y-%m-%d')
+            por_dia.setdefault(dia, []).append(_linha(registro))
+
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        with self.trava():
+            for dia, linhas in por_dia.items():
+                with open(self.pasta / f'{dia}.jsonl', 'ab') as arquivo:
+                    arquivo.write(b''.join(linhas))
+            # Compactação periódica: na virada do mês, os dias encerrados viram um segmento mensal
+            if self._diarios_encerrados():
+                self._compactar()
+
+    def _diarios_encerrados(self) -> dict:
+        """Segmentos diários de meses anteriores ao atual, agrupados por mês."""
+        mes_atual = datetime.now().strftime('%Y-%m')
+        encerrados = {}
+        for caminho in self.pasta.glob('*.jsonl'):
+            encontrado = PADRAO_DIARIO.match(caminho.name)
+            if encontrado and encontrado.group(1) < mes_atual:
+                encerrados.setdefault(encontrado.group(1), []).append(caminho)
+        return encerrados
+
+    def compactar(self):
+        """Junta os segmentos diários de meses encerrados em segmentos mensais."""
+        if not self.pasta.exists():
+            return
+        with self.trava():
+            self._compactar()
+
+    def _compactar(self):
+        for mes, diarios in self._diarios_encerrados().items():
+            mensal = self.pasta / f'{mes}.jsonl'
+            origens = ([mensal] if mensal.exists() else []) + sorted(diarios)
+            linhas = []
+            for origem in origens:
+                linhas.extend(origem.read_bytes().splitlines(keepends=True))
+            # Ordenação estável por data: entradas do mesmo instante mantêm a ordem de escrita
+            linhas.sort(key=lambda linha: json.loads(linha)['DATA'])
+
+            temporario = mensal.with_suffix('.tmp')
+            temporario.write_bytes(b''.join(linhas))
+            indice = IndiceSegmento()
+            indice.atualizar(temporario)
+            temporario.replace(mensal)
+            mensal.with_suffix('.idx.json').write_text(json.dumps(indice.para_dict(), ensure_ascii=False), encoding='utf-8')
+            for diario in diarios:
+                diario.unlink()
+            with self._lock:
+                self._indices[mensal.name] = (mensal.stat().st_ino, indice)
+                for diario in diarios:
+                    self._indices.pop(diario.name, None)
+
+    def _indice(self, caminho: Path) -> IndiceSegmento:
+        """Índice do segmento, estendido se o arquivo cresceu.
+
+        Um segmento reescrito pela compactação (outro inode) é reindexado.
+        """
+        info = caminho.stat()
+        with self._lock:
+            inode, indice = self._indices.get(caminho.name, (None, None))
+            if indice is None or inode != info.st_ino or indice.tamanho > info.st_size:
+                indice = None
+                lateral = caminho.with_suffix('.idx.json')
+                if PADRAO_MENSAL.match(caminho.name) and lateral.exists():
+                    indice = IndiceSegmento.de_dict(json.loads(lateral.read_text(encoding='utf-8')))
+                    if indice.tamanho != info.st_size:
+                        indice = None
+                indice = indice or IndiceSegmento()
+                self._indices[caminho.name] = (info.st_ino, indice)
+            if indice.tamanho < info.st_size:
+                indice.atualizar(caminho)
+            return indice
+
+    def _localizar(self, contrato, inicio, fim) -> list:
+        """Entradas (data, segmento, posição) que atendem aos filtros, pelo índice."""
+        contrato = str(contrato).strip() if contrato else None
+        inicio = pd.Timestamp(inicio).isoformat() if inicio is not None else None
+        # O fim inclui o dia inteiro quando informado como data
+        fim = (pd.Timestamp(fim) + pd.Timedelta(days=1)).isoformat() if fim is not None else None
+
+        encontrados = []
+        for caminho in self.segmentos():
+            indice = self._indice(caminho)
+            linhas = indice.contratos.get(contrato, []) if contrato else range(len(indice.posicoes))
+            if inicio is not None or fim is not None:
+                linhas = [
+                    i for i in linhas
+                    if (inicio is None or indice.datas[i] >= inicio) and (fim is None or indice.datas[i] < fim)
+                ]
+            encontrados.extend((indice.datas[i], caminho, indice.posicoes[i]) for i in linhas)
+        return encontrados
+
+    def contar(self, contrato=None, inicio=None, fim=None) -> int:
+        """Número de entradas que atendem aos filtros, sem ler o log."""
+        if not self.pasta.exists():
+            return 0
+        with self.trava():
+            return len(self._localizar(contrato, inicio, fim))
+
+    def consultar(self, contrato=None, inicio=None, fim=None, numero: int = 1, tamanho: int = 50) -> pd.DataFrame:
+        """Retorna uma página do histórico, do mais recente ao mais antigo.
+
+        Args:
+            contrato: filtra por CONTRATO Nº.
+            inicio, fim: filtram pelo intervalo de datas (inclusive).
+        """
+        registros = []
+        if self.pasta.exists():
+            with self.trava():
+                encontrados = self._localizar(contrato, inicio, fim)
+                # Mais recentes primeiro; só as linhas da página são lidas do disco
+                encontrados.sort(key=lambda item: item[0], reverse=True)
+                inicio_pagina = (numero - 1) * tamanho
+                for _, caminho, posicao in encontrados[inicio_pagina:inicio_pagina + tamanho]:
+                    with open(caminho, 'rb') as arquivo:
+                        arquivo.seek(posicao)
+                        registros.append(json.loads(arquivo.readline()))
+
+        pagina = pd.DataFrame(registros, columns=COLUNAS)
+        pagina['DATA'] = pd.to_datetime(pagina['DATA'], errors='coerce')
+        return aplicar_esquema(pagina, ESQUEMA_HISTORICO)
+
+    def exportar(self) -> pd.DataFrame:
+        """Todas as entradas do log, da mais antiga à mais recente (aba 'Históricos')."""
+        registros = []
+        if self.pasta.exists():
+            with self.trava():
+                for caminho in self.segmentos():
+                    with open(caminho, 'rb') as arquivo:
+                        registros.extend(json.loads(linha) for linha in arquivo if linha.endswith(b'\n'))
+        # Ordenação estável: entradas do mesmo instante mantêm a ordem de escrita
+        registros.sort(key=lambda registro: registro['DATA'])
+        tabela = pd.DataFrame(registros, columns=COLUNAS)
+        tabela['DATA'] = pd.to_datetime(tabela['DATA'], errors='coerce')
+        return tabela
+
+
+# Históricos abertos no processo: ano -> HistoricoAlteracoes
+_historicos = {}
+_lock = threading.Lock()
+
+
+def obter_historico(ano: int) -> HistoricoAlteracoes:
+    """Retorna o histórico do ano, importando a aba 'Históricos' na primeira vez."""
+    if ano is None:
+        raise ValueError("Informe o ano do histórico.")
+    with _lock:
+        historico = _historicos.get(ano)
+        if historico is None:
+            historico = HistoricoAlteracoes(PASTA_HISTORICO / str(ano))
+            if not historico.pasta.exists():
+                _importar_aba(historico, ano)
+            _historicos[ano] = historico
+        return historico
+
+
+def _importar_aba(historico: HistoricoAlteracoes, ano: int):
+    """Migra as entradas da antiga aba 'Históricos' do ano para o log."""
+    try:
+        legado = obter_armazenamento().ler('Históricos', ano)
+    except Exception:
+        legado = pd.DataFrame(columns=COLUNAS)
+    if not legado.empty and all(col in legado.columns for col in COLUNAS):
+        historico.registrar(legado[COLUNAS])
+    historico.pasta.mkdir(parents=True, exist_ok=True)
+
+
+if __name__ == '__main__':
+    # Uso: python historico.py compactar [ano ...]
+    if len(sys.argv) < 2 or sys.argv[1] != 'compactar':
+        sys.exit('Uso: python historico.py compactar [ano ...]')
+    for ano in [int(ano) for ano in sys.argv[2:]] or obter_armazenamento().anos():
+        obter_historico(ano).compactar()
+        print(f"Histórico de {ano} compactado.")
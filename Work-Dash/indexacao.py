@@ -0,0 +1,252 @@
+import atexit
+import hashlib
+import shutil
+import tempfile
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from langchain_community.document_loaders.pdf import PyPDFLoader
+from langchain_community.vectorstores.faiss import FAISS
+from clientes import modelo_embeddings
+from configs import MAX_WORKERS_INDEXACAO, TAMANHO_LOTE_EMBEDDINGS, EMBEDDING_KWARGS
+from utils import dividir_documentos
+
+# Estados possíveis de uma tarefa de indexação
+PENDENTE = 'pendente'
+CARREGANDO = 'carregando'
+DIVIDINDO = 'dividindo'
+EMBUTINDO = 'embutindo'
+CONCLUIDA = 'concluida'
+CANCELADA = 'cancelada'
+ERRO = 'erro'
+
+
+
+class IndexacaoCancelada(Exception):
+    """Sinaliza que a indexação foi cancelada pelo usuário."""
+
+
+class TarefaIndexacao:
+    """Estado e progresso da indexação de um conjunto de PDFs."""
+
+    def __init__(self, chave: str, arquivos: list, api_key: str, tamanho_lote: int):
+        self.chave = chave
+        self.arquivos = arquivos
+        self.api_key = api_key
+        self.tamanho_lote = tamanho_lote
+        self.status = PENDENTE
+        self.paginas_lidas = 0
+        self.chunks_embutidos = 0
+        self.total_chunks = 0
+        self.erro = None
+        self.vector_store = None
+        # Pasta do vector store gravado em disco quando a memória foi liberada
+        self.caminho_despejo = None
+        self.sessoes = set()
+        self._cancelar = threading.Event()
+
+    @property
+    def em_andamento(self) -> bool:
+        return self.status in (PENDENTE, CARREGANDO, DIVIDINDO, EMBUTINDO)
+
+    def progresso(self) -> float:
+        """Fração concluída (0 a 1), usada na barra de progresso."""
+        if self.status == CONCLUIDA:
+            return 1.0
+        if not self.total_chunks:
+            return 0.0
+        return self.chunks_embutidos / self.total_chunks
+
+    def verificar_cancelamento(self):
+        if self._cancelar.is_set():
+            raise IndexacaoCancelada()
+
+
+# Tarefas compartilhadas por todas as sessões do processo
+_tarefas = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS_INDEXACAO, thread_name_prefix='indexacao')
+
+
+# Último hash calculado por pasta: (assinatura dos arquivos, hash)
+_hashes = {}
+
+
+def hash_corpus(pasta: Path) -> str:
+    """Calcula o hash do conteúdo dos PDFs da pasta (chave da indexação).
+
+    Os arquivos só são relidos quando nome, data de modificação ou tamanho
+    de algum deles muda.
+    """
+    arquivos = sorted(pasta.glob('*.pdf'))
+    assinatura = tuple((arquivo.name, arquivo.stat().st_mtime_ns, arquivo.stat().st_size) for arquivo in arquivos)
+    with _lock:
+        anterior = _hashes.get(str(pasta))
+    if anterior is not None and anterior[0] == assinatura:
+        return anterior[1]
+
+    sha = hashlib.sha256()
+    for arquivo in arquivos:
+        sha.update(arquivo.name.encode('utf-8'))
+        sha.update(arquivo.read_bytes())
+    with _lock:
+        _hashes[str(pasta)] = (assinatura, sha.hexdigest())
+    return sha.hexdigest()
+
+
+def _executar(tarefa: TarefaIndexacao):
+    """Carrega, divide e embute os documentos, atualizando o progresso.
+
+    Roda fora do contexto do Streamlit: o progresso e os erros são informados
+    apenas pela tarefa, que as páginas consultam.
+    """
+    try:
+        tarefa.status = CARREGANDO
+        documentos = []
+        for arquivo in tarefa.arquivos:
+            tarefa.verificar_cancelamento()
+            paginas = PyPDFLoader(str(arquivo)).load()
+            documentos.extend(paginas)
+            tarefa.paginas_lidas += len(paginas)
+
+        tarefa.verificar_cancelamento()
+        tarefa.status = DIVIDINDO
+        documentos_divididos = dividir_documentos(documentos)
+        if not documentos_divididos:
+            raise ValueError("Nenhum trecho gerado a partir dos documentos.")
+        tarefa.total_chunks = len(documentos_divididos)
+
+        tarefa.status = EMBUTINDO
+        embedding_model = modelo_embeddings(tarefa.api_key, **EMBEDDING_KWARGS)
+        vector_store = None
+        for inicio in range(0, len(documentos_divididos), tarefa.tamanho_lote):
+            tarefa.verificar_cancelamento()
+            lote = documentos_divididos[inicio:inicio + tarefa.tamanho_lote]
+            if vector_store is None:
+                vector_store = FAISS.from_documents(documents=lote, embedding=embedding_model)
+            else:
+                vector_store.add_documents(lote)
+            tarefa.chunks_embutidos += len(lote)
+
+        tarefa.vector_store = vector_store
+        tarefa.status = CONCLUIDA
+    except IndexacaoCancelada:
+        tarefa.status = CANCELADA
+    except Exception as e:
+        tarefa.erro = str(e)
+        tarefa.status = ERRO
+
+
+def iniciar_indexacao(pasta: Path, api_key: str, sessao: str, tamanho_lote: int = TAMANHO_LOTE_EMBEDDINGS) -> TarefaIndexacao:
+    """Inicia (ou reaproveita) a indexação dos PDFs da pasta.
+
+    Sessões que pedem o mesmo corpus compartilham a mesma tarefa.
+    """
+    chave = hash_corpus(pasta)
+    with _lock:
+        tarefa = _tarefas.get(chave)
+        if tarefa is None or tarefa.status in (CANCELADA, ERRO) or tarefa._cancelar.is_set():
+            tarefa = TarefaIndexacao(chave, sorted(pasta.glob('*.pdf')), api_key, tamanho_lote)
+            # Tarefas encerradas que todas as sessões já recolheram foram substituídas:
+            # seus vector stores ficam só com as sessões que já montaram a cadeia
+            for antiga in [c for c, t in _tarefas.items() if not t.em_andamento and not t.sessoes]:
+                del _tarefas[antiga]
+            _tarefas[chave] = tarefa
+            _executor.submit(_executar, tarefa)
+        tarefa.sessoes.add(sessao)
+    return tarefa
+
+
+def obter_tarefa(chave: str):
+    """Retorna a tarefa de indexação da chave, se existir."""
+    with _lock:
+        return _tarefas.get(chave)
+
+
+def cancelar_indexacao(chave: str, sessao: str):
+    """Desvincula a sessão da tarefa e a cancela se nenhuma outra sessão a aguarda."""
+    with _lock:
+        tarefa = _tarefas.get(chave)
+        if tarefa is None:
+            return
+        tarefa.sessoes.discard(sessao)
+        if not tarefa.sessoes and tarefa.em_andamento:
+            tarefa._cancelar.set()
+
+
+def concluir_tarefa(chave: str, sessao: str):
+    """Registra que a sessão recolheu o resultado da tarefa encerrada.
+
+    A tarefa é descartada quando todas as sessões que a aguardavam a recolheram.
+    """
+    with _lock:
+        tarefa = _tarefas.get(chave)
+        if tarefa is None:
+            return
+        tarefa.sessoes.discard(sessao)
+        if not tarefa.sessoes and not tarefa.em_andamento:
+            del _tarefas[chave]
+
+
+# Vector stores liberados da memória são gravados em uma pasta privada do
+# processo (criada com permissão 0700 e removida ao sair). Só são recarregadas
+# as pastas gravadas por este processo: assinatura -> pasta
+_pasta_despejo = None
+_despejados = {}
+
+
+def _pasta_privada() -> Path:
+    global _pasta_despejo
+    if _pasta_despejo is None:
+        _pasta_despejo = Path(tempfile.mkdtemp(prefix='work_dash_vector_stores_'))
+        atexit.register(shutil.rmtree, _pasta_despejo, ignore_errors=True)
+    return _pasta_despejo
+
+
+def despejar_vector_store(vector_store) -> Path:
+    """Grava o vector store em disco (uma vez por conteúdo) e retorna a pasta."""
+    assinatura = hashlib.sha256(''.join(vector_store.index_to_docstore_id.values()).encode('utf-8')).hexdigest()[:16]
+    with _lock:
+        caminho = _despejados.get(assinatura)
+        if caminho is None:
+            caminho = _pasta_privada() / assinatura
+            vector_store.save_local(str(caminho))
+            _despejados[assinatura] = caminho
+    return caminho
+
+
+# Vector stores recarregados, compartilhados enquanto alguma sessão os usar
+_carregados = weakref.WeakValueDictionary()
+
+
+def carregar_vector_store(caminho: Path, api_key: str):
+    """Recarrega um vector store gravado por despejar_vector_store neste processo."""
+    with _lock:
+        if caminho not in _despejados.values():
+            raise ValueError(f"Vector store não gravado por este processo: {caminho}")
+        vector_store = _carregados.get(str(caminho))
+    if vector_store is None:
+        # load_local desserializa o docstore com pickle: exige uma pasta gravada por nós
+        vector_store = FAISS.load_local(
+            str(caminho), modelo_embeddings(api_key, **EMBEDDING_KWARGS), allow_dangerous_deserialization=True
+        )
+        with _lock:
+            vector_store = _carregados.setdefault(str(caminho), vector_store)
+    return vector_store
+
+
+def liberar_vector_store(vector_store, caminho: Path):
+    """Descarta o vector store das tarefas concluídas; ele passa a ser lido de `caminho`."""
+    with _lock:
+        for tarefa in _tarefas.values():
+            if tarefa.vector_store is vector_store:
+                tarefa.vector_store = None
+                tarefa.caminho_despejo = caminho
+
+
+def vector_store_da_tarefa(tarefa: TarefaIndexacao):
+    """Vector store da tarefa concluída, recarregado do disco se tiver sido liberado."""
+    if tarefa.vector_store is None and tarefa.caminho_despejo is not None:
+        tarefa.vector_store = carregar_vector_store(tarefa.caminho_despejo, tarefa.api_key)
+    return tarefa.vector_store
@@ -0,0 +1,60 @@
+import pandas as pd
+
+COLUNAS_BUSCA = ('CONTRATO Nº', 'EMPRESA', 'SISTEMA')
+TAMANHO_NGRAMA = 3
+
+
+def normalizar(texto) -> str:
+    """Normaliza o texto para busca (sem diferenciar maiúsculas)."""
+    return str(texto).casefold()
+
+
+def ngramas(texto: str, n: int) -> set:
+    """Retorna o conjunto de n-gramas do texto."""
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+class IndiceBusca:
+    """Índice de n-gramas sobre número do contrato, EMPRESA e SISTEMA.
+
+    Guarda, para cada n-grama de 1 a 3 caracteres, as posições das linhas
+    que o contêm. Consultas curtas são respondidas direto do índice; as
+    maiores intersectam os trigramas e confirmam apenas os candidatos.
+    """
+
+    def __init__(self, df: pd.DataFrame, colunas=COLUNAS_BUSCA):
+        self.df = df
+        self._textos = []
+        self._postings = {}
+
+        colunas = [col for col in colunas if col in df.columns]
+        valores = df[colunas].astype(str).to_numpy() if colunas else [[]] * len(df)
+        for posicao, linha in enumerate(valores):
+            # Separador que não aparece nas consultas evita casar entre colunas
+            texto = '\x00'.join(normalizar(valor) for valor in linha)
+            self._textos.append(texto)
+            for n in range(1, TAMANHO_NGRAMA + 1):
+                for grama in ngramas(texto, n):
+                    self._postings.setdefault(grama, set()).add(posicao)
+
+    def buscar(self, consulta: str) -> list:
+        """Retorna as posições (ordenadas) das linhas que contêm a consulta."""
+        consulta = normalizar(consulta).strip()
+        if not consulta:
+            return list(range(len(self.df)))
+
+        if len(consulta) <= TAMANHO_NGRAMA:
+            return sorted(self._postings.get(consulta, ()))
+
+        listas = [self._postings.get(grama) for grama in ngramas(consulta, TAMANHO_NGRAMA)]
+        if not all(listas):
+            return []
+        listas.sort(key=len)
+        candidatos = set(listas[0]).intersection(*listas[1:])
+        return sorted(p for p in candidatos if consulta in self._textos[p])
+
+
+def pagina(df: pd.DataFrame, posicoes: list, numero: int, tamanho: int) -> pd.DataFrame:
+    """Materializa apenas as linhas da página solicitada (numeração a partir de 1)."""
+    inicio = (numero - 1) * tamanho
+    return df.iloc[posicoes[inicio:inicio + tamanho]]
@@ -0,0 +1,135 @@
+import numbers
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+CHAVE_CONTRATO = ('CONTRATO Nº', 'SISTEMA')
+COLUNA_OPERACAO = 'OPERAÇÃO'
+ADICIONAR = 'ADICIONAR'
+ATUALIZAR = 'ATUALIZAR'
+EXCLUIR = 'EXCLUIR'
+ACOES_LOTE = {
+    ADICIONAR: 'Adicionado (lote)',
+    ATUALIZAR: 'Atualizado (lote)',
+    EXCLUIR: 'Excluído (lote)',
+}
+
+
+def chave(contrato, sistema) -> tuple:
+    """Normaliza a chave (CONTRATO Nº, SISTEMA)."""
+    return (str(contrato).strip(), str(sistema).strip())
+
+
+class IndiceContratos:
+    """Índice hash (CONTRATO Nº, SISTEMA) -> rótulos das linhas do DataFrame.
+
+    A chave não é única na planilha, por isso cada entrada guarda a lista
+    de linhas correspondentes.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._linhas = {}
+        if all(col in df.columns for col in CHAVE_CONTRATO):
+            pares = zip(df['CONTRATO Nº'].to_numpy(), df['SISTEMA'].to_numpy(), df.index)
+            for contrato, sistema, rotulo in pares:
+                self._linhas.setdefault(chave(contrato, sistema), []).append(rotulo)
+
+    def localizar(self, contrato, sistema) -> list:
+        """Retorna os rótulos das linhas com a chave informada."""
+        return self._linhas.get(chave(contrato, sistema), [])
+
+    def __contains__(self, par) -> bool:
+        return chave(*par) in self._linhas
+
+
+def ler_lote(arquivo) -> pd.DataFrame:
+    """Lê um lote de alterações em CSV ou Excel."""
+    tipos = {col: str for col in CHAVE_CONTRATO}
+    if arquivo.name.lower().endswith('.csv'):
+        lote = pd.read_csv(arquivo, sep=None, engine='python', dtype=tipos)
+    else:
+        lote = pd.read_excel(arquivo, dtype=tipos)
+    if COLUNA_OPERACAO not in lote.columns:
+        raise ValueError(f"O lote precisa da coluna '{COLUNA_OPERACAO}'.")
+    lote[COLUNA_OPERACAO] = lote[COLUNA_OPERACAO].astype(str).str.strip().str.upper()
+    return lote
+
+
+def aplicar_lote(df: pd.DataFrame, lote: pd.DataFrame, indice: IndiceContratos = None):
+    """Aplica um lote de inclusões, atualizações e exclusões como uma transação.
+
+    Todas as operações são validadas contra o estado atual antes de qualquer
+    alteração; se alguma falhar, nada é aplicado e um ValueError lista os erros.
+
+    Returns:
+        tuple: (novo DataFrame de contratos, registros de histórico, resumo por operação)
+    """
+    indice = indice if indice is not None and indice.df is df else IndiceContratos(df)
+    colunas_dados = [col for col in lote.columns if col in df.columns]
+
+    erros = []
+    novas_linhas = []
+    atualizacoes = []
+    exclusoes = set()
+    historico = []
+    resumo = {op: 0 for op in ACOES_LOTE}
+
+    for numero, linha in enumerate(lote.to_dict('records'), start=1):
+        operacao = linha[COLUNA_OPERACAO]
+        par = (linha.get('CONTRATO Nº'), linha.get('SISTEMA'))
+        if operacao not in ACOES_LOTE:
+            erros.append(f"Linha {numero}: operação inválida '{operacao}'.")
+            continue
+        if any(pd.isna(valor) or not str(valor).strip() for valor in par):
+            erros.append(f"Linha {numero}: CONTRATO Nº e SISTEMA são obrigatórios.")
+            continue
+
+        rotulos = indice.localizar(*par)
+        if operacao == ADICIONAR:
+            novas_linhas.append({col: linha[col] for col in colunas_dados})
+        elif not rotulos:
+            erros.append(f"Linha {numero}: contrato {par[0]} / {par[1]} não encontrado.")
+            continue
+        elif exclusoes.intersection(rotulos):
+            erros.append(f"Linha {numero}: contrato {par[0]} / {par[1]} já excluído neste lote.")
+            continue
+        elif operacao == ATUALIZAR:
+            valores = {col: linha[col] for col in colunas_dados
+                       if col not in CHAVE_CONTRATO and not pd.isna(linha[col])}
+            atualizacoes.append((rotulos, valores))
+        else:
+            exclusoes.update(rotulos)
+
+        resumo[operacao] += 1
+        historico.append({'CONTRATO Nº': par[0], 'AÇÃO': ACOES_LOTE[operacao]})
+
+    if erros:
+        raise ValueError('\n'.join(erros))
+
+    novo_df = df.copy()
+    for rotulos, valores in atualizacoes:
+        rotulos = [r for r in rotulos if r not in exclusoes]
+        for col, valor in valores.items():
+            # Colunas categóricas precisam conhecer o novo valor antes da atribuição
+            if isinstance(novo_df[col].dtype, pd.CategoricalDtype) and valor not in novo_df[col].cat.categories:
+                novo_df[col] = novo_df[col].cat.add_categories([valor])
+            # Colunas inteiras são ampliadas antes da atribuição para comportar qualquer valor numérico
+            elif pd.api.types.is_integer_dtype(novo_df[col].dtype) and isinstance(valor, numbers.Number):
+                inteiro = isinstance(valor, numbers.Integral) or float(valor).is_integer()
+                novo_df[col] = novo_df[col].astype(np.int64 if inteiro else np.float64)
+            # Colunas float32 perdem precisão em valores grandes (12345678.91 vira 12345679.0)
+            elif novo_df[col].dtype == np.float32 and isinstance(valor, numbers.Number):
+                novo_df[col] = novo_df[col].astype(np.float64)
+            novo_df.loc[rotulos, col] = valor
+    if exclusoes:
+        novo_df = novo_df.drop(index=list(exclusoes))
+    if novas_linhas:
+        novo_df = pd.concat([novo_df, pd.DataFrame(novas_linhas)], ignore_index=True)
+
+    # Todas as entradas do lote compartilham o mesmo instante
+    agora = datetime.now()
+    df_log = pd.DataFrame(historico, columns=['CONTRATO Nº', 'AÇÃO'])
+    df_log['DATA'] = agora
+
+    return novo_df, df_log, resumo
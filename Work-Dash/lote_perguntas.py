@@ -0,0 +1,104 @@
+"""Modo em lote: responde um arquivo de perguntas sobre os PDFs, sem interface.
+
+Uso:
+    python lote_perguntas.py perguntas.txt --saida respostas.jsonl --paralelismo 4
+
+O arquivo de perguntas tem uma pergunta por linha (linhas vazias e iniciadas
+por '#' são ignoradas). Com --base-url, as chamadas vão para um servidor
+compatível com a OpenAI (ex.: servidor_simulado.py), para medir o
+desempenho sem rede.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from configs import EMBEDDING_KWARGS
+from utils import PASTA_ARQUIVOS, importacao_documentos, split_de_documentos, cria_vector_store, monta_chain, validar_openai_key
+
+
+def ler_perguntas(arquivo: Path) -> list:
+    linhas = (linha.strip() for linha in arquivo.read_text(encoding='utf-8').splitlines())
+    return [linha for linha in linhas if linha and not linha.startswith('#')]
+
+
+def configurar_servidor(base_url: str):
+    """Aponta os clientes OpenAI para um servidor local compatível."""
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ['OPENAI_API_BASE'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'chave-local')
+    # O servidor local recebe o texto direto, sem a tokenização do tiktoken
+    EMBEDDING_KWARGS['check_embedding_ctx_length'] = False
+
+
+def responder(chain, indice: int, pergunta: str) -> dict:
+    inicio = time.perf_counter()
+    registro = {'indice': indice, 'pergunta': pergunta}
+    try:
+        # Sem memória: cada pergunta é independente e pode rodar em paralelo
+        resposta = chain.invoke({'question': pergunta, 'chat_history': []})
+        registro['resposta'] = resposta['answer']
+        registro['fontes'] = [
+            {'fonte': doc.metadata.get('source'), 'pagina': doc.metadata.get('page')}
+            for doc in resposta.get('source_documents', [])
+        ]
+    except Exception as e:
+        registro['erro'] = str(e)
+    registro['latencia_s'] = round(time.perf_counter() - inicio, 4)
+    return registro
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Responde um arquivo de perguntas sobre os PDFs.")
+    parser.add_argument('perguntas', type=Path, help="Arquivo com uma pergunta por linha")
+    parser.add_argument('--saida', type=Path, default=Path('respostas.jsonl'), help="Arquivo JSONL de resultados")
+    parser.add_argument('--pasta', type=Path, default=PASTA_ARQUIVOS, help="Pasta com os PDFs")
+    parser.add_argument('--paralelismo', type=int, default=4, help="Número máximo de perguntas simultâneas")
+    parser.add_argument('--base-url', help="URL de um servidor compatível com a OpenAI (ex.: http://127.0.0.1:8765/v1)")
+    args = parser.parse_args()
+
+    if args.base_url:
+        configurar_servidor(args.base_url)
+
+    perguntas = ler_perguntas(args.perguntas)
+    if not perguntas:
+        sys.exit("Nenhuma pergunta encontrada.")
+
+    inicio = time.perf_counter()
+    documentos = split_de_documentos(importacao_documentos(args.pasta))
+    if not documentos:
+        sys.exit(f"Nenhum documento para indexar em {args.pasta}.")
+    vector_store = cria_vector_store(documentos)
+    openai_api_key = validar_openai_key()
+    if vector_store is None or not openai_api_key:
+        sys.exit("Falha ao criar o índice dos documentos.")
+    tempo_indexacao = time.perf_counter() - inicio
+    chain = monta_chain(vector_store, openai_api_key, verbose=False)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(args.paralelismo, 1)) as executor, \
+            args.saida.open('w', encoding='utf-8') as saida:
+        # map preserva a ordem das perguntas no arquivo de saída
+        registros = list(executor.map(lambda item: responder(chain, *item), enumerate(perguntas)))
+        for registro in registros:
+            saida.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    tempo_total = time.perf_counter() - inicio
+
+    latencias = [r['latencia_s'] for r in registros]
+    erros = sum('erro' in r for r in registros)
+    print(f"{len(documentos)} trecho(s) indexado(s) em {tempo_indexacao:.2f}s")
+    print(f"{len(registros)} pergunta(s) em {tempo_total:.2f}s "
+          f"({len(registros) / tempo_total:.2f}/s, paralelismo {args.paralelismo}), {erros} erro(s)")
+    print(f"Latência p50 {percentil(latencias, 0.5):.3f}s, p95 {percentil(latencias, 0.95):.3f}s")
+    print(f"Resultados em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""Objetos pesados das sessões, contabilidade de memória e liberação de sessões ociosas.
+
+DataFrames, índices e a cadeia do chat de cada sessão ficam em um
+armazenamento do processo, indexado pelo id da sessão; o session_state guarda
+apenas o registro da sessão (o identificador). As páginas acessam esses
+objetos por obter_objeto e guardar_objeto.
+
+Cada execução de página registra a sessão e mede seus objetos por tipo
+(DataFrames, índices, vector store do chat e mensagens). Se o total do
+processo passa de ORCAMENTO_MEMORIA_SESSOES_MB, as sessões ociosas há mais de
+OCIOSIDADE_SESSAO_S, das mais antigas para as mais recentes, têm seus
+objetos liberados na hora, até o total voltar ao orçamento:
+
+- DataFrames e índices são descartados; leitura_de_dados e as páginas os
+  recriam no próximo acesso da sessão;
+- o vector store do chat é gravado em disco e recarregado por restaurar_chain
+  quando a sessão volta à página do chat (a memória da conversa é mantida).
+
+O total só diminui depois que os objetos saíram do armazenamento do processo.
+"""
+import sys
+import threading
+import time
+import uuid
+import weakref
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from configs import ORCAMENTO_MEMORIA_SESSOES_MB, OCIOSIDADE_SESSAO_S
+
+DATAFRAMES = 'dataframes'
+INDICES = 'indices'
+VECTOR_STORE = 'vector_store'
+MENSAGENS = 'mensagens'
+
+# Objetos da sessão medidos e o tipo de cada um
+TIPOS = {
+    'dados': DATAFRAMES,
+    'particoes': DATAFRAMES,
+    'relatorio_memoria': DATAFRAMES,
+    'indice_busca': INDICES,
+    'indice_contratos': INDICES,
+    'chain': VECTOR_STORE,
+}
+# Objetos descartados ao liberar uma sessão; recriados a partir do armazenamento
+DESCARTAVEIS = ('dados', 'particoes', 'relatorio_memoria', 'indice_busca', 'indice_contratos')
+# Classes do próprio projeto cujos atributos são medidos (índices de busca e de contratos)
+MODULOS_LOCAIS = {'indice_busca', 'indice_contratos', 'esquema'}
+# Chave do session_state com o registro da própria sessão
+CHAVE_REGISTRO = 'registro_memoria'
+
+
+def _vector_store(chain):
+    """Vector store por trás do retriever da cadeia (com ou sem RetrieverComOrcamento)."""
+    retriever = getattr(chain, 'retriever', None)
+    retriever = getattr(retriever, 'retriever', retriever)
+    return getattr(retriever, 'vectorstore', None)
+
+
+# Tamanhos já medidos dos objetos pesados: id -> (referência fraca, versão, bytes).
+# A entrada sai junto com o objeto; a versão muda com os dados ou com o formato.
+_tamanhos = {}
+
+
+def _em_cache(obj, versao, medir) -> int:
+    """Tamanho de `obj`, medido de novo apenas se o objeto ou sua versão mudou."""
+    anterior = _tamanhos.get(id(obj))
+    if anterior is not None and anterior[0]() is obj and anterior[1] == versao:
+        return anterior[2]
+    valor = medir()
+    try:
+        referencia = weakref.ref(obj, lambda _, chave=id(obj): _tamanhos.pop(chave, None))
+    except TypeError:
+        return valor
+    _tamanhos[id(obj)] = (referencia, versao, valor)
+    return valor
+
+
+def tamanho(obj, vistos: set = None, versao=None) -> int:
+    """Estimativa em bytes do objeto e do que ele referencia (cada objeto contado uma vez).
+
+    DataFrames, índices e vector stores ficam em cache por objeto e `versao`
+    (a versão dos dados da sessão), para não serem percorridos a cada execução.
+    """
+    vistos = set() if vistos is None else vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return _em_cache(obj, (versao, obj.shape), lambda: int(np.sum(obj.memory_usage(deep=True))))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(tamanho(k, vistos, versao) + tamanho(v, vistos, versao) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(tamanho(item, vistos, versao) for item in obj)
+    if hasattr(obj, 'index') and hasattr(obj, 'docstore'):
+        # Vector store FAISS: vetores float32 mais os trechos de texto
+        return _em_cache(obj, obj.index.ntotal, lambda: (
+            obj.index.ntotal * obj.index.d * 4 + tamanho(getattr(obj.docstore, '_dict', {}))
+        ))
+    if type(obj).__module__ in MODULOS_LOCAIS and hasattr(obj, '__dict__'):
+        # O DataFrame de um índice é o mesmo dos dados da sessão e já é contado lá
+        return _em_cache(obj, versao, lambda: sys.getsizeof(obj) + tamanho({
+            nome: valor for nome, valor in vars(obj).items() if not isinstance(valor, (pd.DataFrame, pd.Series))
+        }))
+    return sys.getsizeof(obj)
+
+
+def _mensagens_da_memoria(memoria) -> list:
+    historico = getattr(memoria, 'chat_memory', None)
+    return [getattr(m, 'content', '') for m in getattr(historico, 'messages', [])]
+
+
+# Objetos pesados das sessões: id da sessão -> {chave: objeto}
+_objetos = {}
+# Registros das sessões: id da sessão -> RegistroSessao. O registro vive no
+# session_state da própria sessão e sai daqui quando o Streamlit a encerra.
+_sessoes = weakref.WeakValueDictionary()
+_lock = threading.Lock()
+
+
+def _encerrar(sessao: str):
+    """Descarta os objetos de uma sessão encerrada (seu registro foi coletado)."""
+    if sessao not in _sessoes:
+        _objetos.pop(sessao, None)
+
+
+class RegistroSessao:
+    """Identificador da sessão no session_state, com último acesso e uso de memória medido."""
+
+    def __init__(self, sessao: str):
+        self.sessao = sessao
+        self.ultimo_acesso = time.monotonic()
+        self.uso = {}
+        # Vector stores podem ser compartilhados entre sessões: id -> bytes
+        self.vector_stores = {}
+        # Versão dos dados e tamanho das mensagens, informados pela própria sessão
+        self.versao = None
+        self.mensagens = 0
+        # Vezes em que outra sessão liberou os objetos desta por falta de memória
+        self.liberacoes = 0
+        weakref.finalize(self, _encerrar, sessao)
+
+    def medir(self, objetos: dict):
+        uso = {MENSAGENS: self.mensagens}
+        vector_stores = {}
+        vistos = set()
+        for chave, tipo in TIPOS.items():
+            if chave not in objetos:
+                continue
+            valor = objetos[chave]
+            if tipo == VECTOR_STORE:
+                vector_store = _vector_store(valor)
+                if vector_store is not None:
+                    vector_stores[id(vector_store)] = tamanho(vector_store)
+                uso[MENSAGENS] += tamanho(_mensagens_da_memoria(getattr(valor, 'memory', None)), vistos)
+            else:
+                uso[tipo] = uso.get(tipo, 0) + tamanho(valor, vistos, self.versao)
+        if 'chain_despejada' in objetos:
+            uso[MENSAGENS] += tamanho(_mensagens_da_memoria(objetos['chain_despejada']['memoria']), vistos)
+        uso[VECTOR_STORE] = sum(vector_stores.values())
+        self.uso = uso
+        self.vector_stores = vector_stores
+
+    def total(self) -> int:
+        return sum(self.uso.values())
+
+    def liberavel(self) -> int:
+        """Bytes que a liberação da sessão pode descartar (as mensagens ficam)."""
+        return self.total() - self.uso.get(MENSAGENS, 0)
+
+
+def _objetos_da_sessao() -> dict:
+    """Objetos da sessão atual, registrando-a se preciso. Chamada com _lock."""
+    registro = st.session_state.get(CHAVE_REGISTRO)
+    if registro is None:
+        ctx = get_script_run_ctx()
+        registro = RegistroSessao(ctx.session_id if ctx is not None else uuid.uuid4().hex)
+        st.session_state[CHAVE_REGISTRO] = registro
+    _sessoes[registro.sessao] = registro
+    # Uma sessão que acessa seus objetos não está ociosa
+    registro.ultimo_acesso = time.monotonic()
+    return _objetos.setdefault(registro.sessao, {})
+
+
+def obter_objeto(chave: str, padrao=None):
+    """Objeto pesado da sessão atual, ou `padrao` se não existe ou foi liberado."""
+    with _lock:
+        return _objetos_da_sessao().get(chave, padrao)
+
+
+def obter_ou_guardar(chave: str, valor):
+    """Como dict.setdefault: o objeto da sessão, guardando `valor` se não existir."""
+    with _lock:
+        return _objetos_da_sessao().setdefault(chave, valor)
+
+
+def guardar_objeto(chave: str, valor):
+    """Guarda um objeto pesado da sessão atual no armazenamento do processo."""
+    with _lock:
+        _objetos_da_sessao()[chave] = valor
+
+
+def descartar_objeto(chave: str):
+    """Descarta um objeto da sessão atual, se existir."""
+    with _lock:
+        _objetos_da_sessao().pop(chave, None)
+
+
+def _total_processo(sessoes: list) -> int:
+    """Uso total das sessões, contando uma única vez cada vector store compartilhado."""
+    compartilhados = {}
+    total = 0
+    for registro in sessoes:
+        total += registro.total() - registro.uso.get(VECTOR_STORE, 0)
+        compartilhados.update(registro.vector_stores)
+    return total + sum(compartilhados.values())
+
+
+def _liberar(registro: RegistroSessao):
+    """Descarta DataFrames e índices de uma sessão ociosa e grava seu vector store em disco.
+
+    Chamada com _lock: a sessão só volta a acessar seus objetos depois, e
+    então os recria ou recarrega.
+    """
+    objetos = _objetos.get(registro.sessao, {})
+    for chave in DESCARTAVEIS:
+        objetos.pop(chave, None)
+
+    chain = objetos.get('chain')
+    if chain is not None:
+        vector_store = _vector_store(chain)
+        try:
+            # Importação tardia: só sessões com chat dependem da pilha de LLM
+            from indexacao import despejar_vector_store, liberar_vector_store
+            caminho = despejar_vector_store(vector_store)
+        except Exception as e:
+            print(f"Falha ao gravar o vector store da sessão: {e}", file=sys.stderr)
+        else:
+            objetos['chain_despejada'] = {'caminho': caminho, 'memoria': chain.memory}
+            del objetos['chain']
+            # Só sai da memória do processo se nenhuma outra sessão ainda o usa
+            compartilhado = any(
+                _vector_store(outros.get('chain')) is vector_store
+                for sessao, outros in _objetos.items() if sessao != registro.sessao
+            )
+            if not compartilhado:
+                liberar_vector_store(vector_store, caminho)
+    registro.liberacoes += 1
+    # Mede o que restou: só o que saiu do armazenamento deixa de contar
+    registro.medir(objetos)
+
+
+def acompanhar_sessao():
+    """Registra o acesso da sessão atual, mede seu uso e libera sessões ociosas se preciso.
+
+    Deve ser chamada no início de cada página.
+    """
+    if get_script_run_ctx() is None:
+        return
+    versao = tuple(sorted(st.session_state.get('versoes_dados', {}).items()))
+    mensagens = tamanho(st.session_state.get('messages', []))
+    limite = ORCAMENTO_MEMORIA_SESSOES_MB * 1024 * 1024
+    with _lock:
+        objetos = _objetos_da_sessao()
+        registro = st.session_state[CHAVE_REGISTRO]
+        registro.versao = versao
+        registro.mensagens = mensagens
+        registro.medir(objetos)
+
+        sessoes = list(_sessoes.values())
+        if _total_processo(sessoes) <= limite:
+            return
+        agora = time.monotonic()
+        ociosas = sorted(
+            (
+                outro for outro in sessoes
+                if outro is not registro
+                and agora - outro.ultimo_acesso >= OCIOSIDADE_SESSAO_S and outro.liberavel() > 0
+            ),
+            key=lambda outro: outro.ultimo_acesso
+        )
+        for outro in ociosas:
+            _liberar(outro)
+            if _total_processo(sessoes) <= limite:
+                break
+
+
+def restaurar_chain():
+    """Recria a cadeia do chat da sessão a partir do vector store gravado em disco."""
+    despejo = obter_objeto('chain_despejada')
+    if despejo is None:
+        return
+    if obter_objeto('chain') is not None:
+        descartar_objeto('chain_despejada')
+        return
+    from indexacao import carregar_vector_store
+    from utils import monta_chain, validar_openai_key
+    api_key = validar_openai_key()
+    if not api_key:
+        return
+    vector_store = carregar_vector_store(despejo['caminho'], api_key)
+    guardar_objeto('chain', monta_chain(vector_store, api_key, memory=despejo['memoria']))
+    descartar_objeto('chain_despejada')
+
+
+def metricas_memoria() -> tuple:
+    """Uso de memória por sessão e por tipo de objeto, em MB.
+
+    Returns:
+        tuple: (DataFrame por sessão, total do processo em MB)
+    """
+    agora = time.monotonic()
+    with _lock:
+        sessoes = list(_sessoes.values())
+    linhas = [
+        {
+            'SESSÃO': registro.sessao[:8],
+            'OCIOSA HÁ (s)': round(agora - registro.ultimo_acesso),
+            **{tipo: round(registro.uso.get(tipo, 0) / 1024 / 1024, 2)
+               for tipo in (DATAFRAMES, INDICES, VECTOR_STORE, MENSAGENS)},
+            'TOTAL': round(registro.total() / 1024 / 1024, 2),
+            'LIBERAÇÕES': registro.liberacoes,
+        }
+        for registro in sessoes
+    ]
+    total = _total_processo(sessoes)
+    return pd.DataFrame(linhas), round(total / 1024 / 1024, 2)
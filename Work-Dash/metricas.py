@@ -0,0 +1,145 @@
+import pandas as pd
+
+COLUNAS_VALOR = [
+    'VALOR PAGO',
+    'VALOR REAJUSTADO',
+    'DIFERENÇA DE VALOR DE CONTRATO'
+]
+COLUNAS_PRIMEIRO = [
+    'EMPRESA',
+    'SISTEMA',
+    'MÊS',
+    'ÍNDICE',
+    'PEDIDO/ORDEM DE COMPRAS',
+    'STATUS / AÇÃO'
+]
+
+def process_data(df):
+    """Processa os dados agrupando por contrato e somando valores relevantes."""
+    # As somas são feitas em float64, mesmo que as colunas estejam em float32
+    df = df.astype({col: float for col in COLUNAS_VALOR})
+    grouped_df = df.groupby('CONTRATO Nº').agg({
+        'EMPRESA': 'first',
+        'SISTEMA': 'first',
+        'MÊS': 'first',
+        'ÍNDICE': 'first',
+        'VALOR PAGO': 'sum',
+        'VALOR REAJUSTADO': 'sum',
+        'PEDIDO/ORDEM DE COMPRAS': 'first',
+        'STATUS / AÇÃO': 'first',
+        'DIFERENÇA DE VALOR DE CONTRATO': 'sum'
+    }).reset_index()
+
+    return grouped_df
+
+def calculate_metrics(df):
+    """Calcula as métricas a partir do DataFrame filtrado."""
+    valor_previsto = df['VALOR REAJUSTADO'].sum()
+    valor_renovado = df[df['STATUS / AÇÃO'] == 'RENOVADO']['VALOR REAJUSTADO'].sum()
+    valor_em_processo = df[df['STATUS / AÇÃO'] == 'EM PROCESSO']['VALOR REAJUSTADO'].sum()
+    valor_cancelado = df[df['STATUS / AÇÃO'] == 'CANCELADO']['VALOR REAJUSTADO'].sum()
+
+    # Calcular a diferença entre valor pago e valor reajustado para os cancelados
+    df_cancelado = df[df['STATUS / AÇÃO'] == 'CANCELADO']
+    diferenca_cancelado = (df_cancelado['VALOR REAJUSTADO'] - df_cancelado['VALOR PAGO']).sum()
+
+    # Calcular a diferença entre valor pago e valor reajustado para os renovados
+    df_renovado = df[df['STATUS / AÇÃO'] == 'RENOVADO']
+    diferenca_renovado = (df_renovado['VALOR REAJUSTADO'] - df_renovado['VALOR PAGO']).sum()
+
+    # Calcular a diferença entre valor pago e valor reajustado para os em processo
+    df_em_processo = df[df['STATUS / AÇÃO'] == 'EM PROCESSO']
+    diferenca_em_processo = (df_em_processo['VALOR REAJUSTADO'] - df_em_processo['VALOR PAGO']).sum()
+
+    # Calcular o percentual de renovação
+    total_contratos = len(df)
+    total_renovados = len(df_renovado)
+    percentual_renovacao = (total_renovados / total_contratos) * 100 if total_contratos > 0 else 0
+
+    return {
+        "valor_previsto": valor_previsto,
+        "valor_renovado": valor_renovado,
+        "valor_em_processo": valor_em_processo,
+        "valor_cancelado": valor_cancelado,
+        "diferenca_cancelado": diferenca_cancelado,
+        "diferenca_renovado": diferenca_renovado,
+        "diferenca_em_processo": diferenca_em_processo,
+        "percentual_renovacao": percentual_renovacao
+    }
+
+# Consultas executadas no banco (armazenamento com suporta_consultas)
+
+def _lista_sql(valores) -> str:
+    return f'({", ".join("?" * len(valores))})'
+
+def _sql_agrupado(anos=None, status=None, meses=None):
+    """Monta o SQL equivalente a process_data seguido dos filtros de status e mês.
+
+    O filtro de anos é aplicado antes do agrupamento (poda de partições).
+    Os campos 'first' vêm da primeira linha (menor rowid) de cada contrato.
+    """
+    params = []
+    filtro_anos = ''
+    if anos is not None:
+        filtro_anos = f'WHERE "ANO" IN {_lista_sql(anos)}' if anos else 'WHERE 0'
+        params.extend(anos)
+
+    primeiros = ', '.join(f'f."{col}"' for col in COLUNAS_PRIMEIRO)
+    somas = ', '.join(f'CAST(SUM(c."{col}") AS REAL) AS "{col}"' for col in COLUNAS_VALOR)
+    sql = f'''
+        WITH base AS (
+            SELECT rowid AS rid, * FROM contratos {filtro_anos}
+        ),
+        primeiros AS (
+            SELECT "CONTRATO Nº", MIN(rid) AS rid FROM base GROUP BY "CONTRATO Nº"
+        ),
+        agrupado AS (
+            SELECT c."CONTRATO Nº", {primeiros}, {somas}
+            FROM base c
+            JOIN primeiros p ON p."CONTRATO Nº" = c."CONTRATO Nº"
+            JOIN base f ON f.rid = p.rid
+            GROUP BY c."CONTRATO Nº"
+        )
+        SELECT * FROM agrupado'''
+    condicoes = []
+    for coluna, valores in (('STATUS / AÇÃO', status), ('MÊS', meses)):
+        if valores is not None:
+            condicoes.append(f'"{coluna}" IN {_lista_sql(valores)}' if valores else '0')
+            params.extend(valores)
+    if condicoes:
+        sql += ' WHERE ' + ' AND '.join(condicoes)
+    return sql, params
+
+def agrupar_contratos(armazenamento, anos=None, status=None, meses=None) -> pd.DataFrame:
+    """Agrupa e filtra os contratos no banco (equivalente a process_data + filtros)."""
+    sql, params = _sql_agrupado(anos, status, meses)
+    return armazenamento.consultar(sql + ' ORDER BY "CONTRATO Nº"', params)
+
+def valores_filtro(armazenamento, coluna: str, anos=None) -> list:
+    """Valores distintos de uma coluna do agrupamento, para os filtros da barra lateral."""
+    sql, params = _sql_agrupado(anos)
+    df = armazenamento.consultar(
+        f'SELECT "{coluna}" FROM ({sql}) GROUP BY "{coluna}" ORDER BY MIN("CONTRATO Nº")', params
+    )
+    return df[coluna].tolist()
+
+def calcular_metricas(armazenamento, anos=None, status=None, meses=None) -> dict:
+    """Calcula no banco as mesmas métricas de calculate_metrics."""
+    sql, params = _sql_agrupado(anos, status, meses)
+    df = armazenamento.consultar(f'''
+        SELECT
+            COALESCE(SUM("VALOR REAJUSTADO"), 0) AS valor_previsto,
+            COALESCE(SUM(CASE WHEN "STATUS / AÇÃO" = 'RENOVADO' THEN "VALOR REAJUSTADO" END), 0) AS valor_renovado,
+            COALESCE(SUM(CASE WHEN "STATUS / AÇÃO" = 'EM PROCESSO' THEN "VALOR REAJUSTADO" END), 0) AS valor_em_processo,
+            COALESCE(SUM(CASE WHEN "STATUS / AÇÃO" = 'CANCELADO' THEN "VALOR REAJUSTADO" END), 0) AS valor_cancelado,
+            COALESCE(SUM(CASE WHEN "STATUS / AÇÃO" = 'CANCELADO' THEN "VALOR REAJUSTADO" - "VALOR PAGO" END), 0) AS diferenca_cancelado,
+            COALESCE(SUM(CASE WHEN "STATUS / AÇÃO" = 'RENOVADO' THEN "VALOR REAJUSTADO" - "VALOR PAGO" END), 0) AS diferenca_renovado,
+            COALESCE(SUM(CASE WHEN "STATUS / AÇÃO" = 'EM PROCESSO' THEN "VALOR REAJUSTADO" - "VALOR PAGO" END), 0) AS diferenca_em_processo,
+            COUNT(*) AS total_contratos,
+            COALESCE(SUM("STATUS / AÇÃO" = 'RENOVADO'), 0) AS total_renovados
+        FROM ({sql})''', params)
+    metricas = df.iloc[0].to_dict()
+    total_contratos = metricas.pop('total_contratos')
+    total_renovados = metricas.pop('total_renovados')
+    metricas['percentual_renovacao'] = (total_renovados / total_contratos) * 100 if total_contratos > 0 else 0
+    return metricas
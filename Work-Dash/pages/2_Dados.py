@@ -1,59 +1,93 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from pathlib import Path
-from carregar_dados import leitura_de_dados
+from carregar_dados import leitura_de_dados, anos_disponiveis, salvar_planilhas, anexar_linhas, invalidar_dados, ConflitoDeVersao
+from historico import obter_historico
+from configs import ORCAMENTO_MEMORIA_SESSOES_MB
+from memoria_sessoes import acompanhar_sessao, guardar_objeto, metricas_memoria, obter_objeto
+from indice_busca import IndiceBusca, pagina
+from indice_contratos import IndiceContratos, COLUNA_OPERACAO, aplicar_lote, ler_lote
 
 # Configurar o layout da página para wide
 st.set_page_config(layout="wide")
 
+# Contabiliza a memória da sessão e libera sessões ociosas acima do orçamento
+acompanhar_sessao()
+
+# Seleção do ano (partição) a ser editado
+anos = anos_disponiveis()
+ano_selecionado = st.sidebar.selectbox('Ano', anos, index=len(anos) - 1) if anos else None
+
 # Carrega os dados
-leitura_de_dados()
+leitura_de_dados([ano_selecionado] if ano_selecionado else None)
 
 # Acesso aos dados carregados
-dados = st.session_state.get('dados', {})
+dados = obter_objeto('dados', {})
 df_contratos = dados.get('df_contratos', pd.DataFrame())
-df_historico = dados.get('df_historico', pd.DataFrame())
-
-# Define o caminho do arquivo
-pasta_datasets = Path(__file__).resolve().parent.parent / 'planilhas'
-file_path = pasta_datasets / '2024.xlsx'
 
-# Verifica se o diretório existe, se não, cria
-if not pasta_datasets.exists():
-    pasta_datasets.mkdir(parents=True, exist_ok=True)
-
-# Função para salvar o DataFrame no Excel
-def save_to_excel(df, file_path, sheet_name='Contratos'):
-    """Salva o DataFrame no arquivo Excel."""
+# Função para salvar o DataFrame no armazenamento configurado
+def save_to_excel(df, sheet_name='Contratos', removidas=None, historico=None):
+    """Salva o DataFrame no armazenamento (Excel ou banco) e registra o histórico."""
     try:
-        with pd.ExcelWriter(file_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            df.to_excel(writer, index=False, sheet_name=sheet_name)
+        salvar_planilhas({sheet_name: df}, removidas=removidas, historico=historico)
+        return True
+    except ConflitoDeVersao:
+        avisar_conflito()
     except Exception as e:
         st.error(f"Erro ao salvar os dados: {e}")
+    return False
+
+def avisar_conflito():
+    """Descarta a cópia desatualizada da sessão após uma escrita concorrente."""
+    invalidar_dados()
+    st.error('Os dados foram alterados por outro usuário. A tabela foi recarregada; refaça a operação.')
 
-# Função para registrar histórico
+# Entrada do histórico, registrada junto com a escrita dos dados
 def log_change(contract_num, action):
-    """Registra uma mudança no histórico."""
-    new_log = pd.DataFrame({
+    """Monta a entrada do histórico (log somente de acréscimo) de uma mudança."""
+    return pd.DataFrame({
         'CONTRATO Nº': [contract_num],
         'AÇÃO': [action],
         'DATA': [datetime.now()]
     })
-    # Atualiza o DataFrame do histórico no session_state
-    st.session_state['dados']['df_historico'] = pd.concat(
-        [st.session_state['dados']['df_historico'], new_log], ignore_index=True
-    )
-    save_to_excel(st.session_state['dados']['df_historico'], file_path, sheet_name='Históricos')
 
 # Exibir a tabela de contratos
 st.title('Gerenciamento de Contratos')
 
+# Índice (CONTRATO Nº, SISTEMA), reconstruído apenas quando o DataFrame muda
+def obter_indice_contratos(df):
+    """Retorna o índice de chaves do DataFrame, reaproveitando o da sessão."""
+    indice = obter_objeto('indice_contratos')
+    if indice is None or indice.df is not df:
+        indice = IndiceContratos(df)
+        guardar_objeto('indice_contratos', indice)
+    return indice
+
+# Índice de busca, reconstruído apenas quando o DataFrame de contratos muda
+def obter_indice_busca(df):
+    """Retorna o índice de busca do DataFrame, reaproveitando o da sessão."""
+    indice = obter_objeto('indice_busca')
+    if indice is None or indice.df is not df:
+        indice = IndiceBusca(df)
+        guardar_objeto('indice_busca', indice)
+    return indice
+
 # Filtros inteligentes
 st.sidebar.header('Filtros')
-filter_contract_num = st.sidebar.text_input('Filtrar por Número do Contrato')
-filtered_df = df_contratos[df_contratos['CONTRATO Nº'].astype(str).str.contains(filter_contract_num)] if filter_contract_num else df_contratos
-st.dataframe(filtered_df)
+filter_contract_num = st.sidebar.text_input('Filtrar por Contrato, Empresa ou Sistema')
+posicoes = obter_indice_busca(df_contratos).buscar(filter_contract_num)
+
+# Paginação: apenas a página atual é enviada ao navegador
+col_tamanho, col_pagina, col_info = st.columns([1, 1, 3])
+with col_tamanho:
+    tamanho_pagina = st.selectbox('Linhas por página', [25, 50, 100, 200], index=1)
+total_paginas = max(1, -(-len(posicoes) // tamanho_pagina))
+with col_pagina:
+    numero_pagina = st.number_input('Página', min_value=1, max_value=total_paginas, value=1, step=1)
+with col_info:
+    inicio = (numero_pagina - 1) * tamanho_pagina
+    st.caption(f'Exibindo {min(inicio + 1, len(posicoes))}–{min(inicio + tamanho_pagina, len(posicoes))} de {len(posicoes)} contrato(s)')
+st.dataframe(pagina(df_contratos, posicoes, numero_pagina, tamanho_pagina))
 
 # Barra lateral para ações
 st.sidebar.header('Ações')
@@ -80,10 +114,13 @@ if st.sidebar.button('Adicionar Novo Contrato'):
         # Adiciona a nova linha sem verificar se o contrato já existe
         new_row = pd.DataFrame([new_row_data])  # Cria um DataFrame a partir da nova linha
         df_contratos = pd.concat([df_contratos, new_row], ignore_index=True)
-        st.session_state['dados']['df_contratos'] = df_contratos  # Atualiza o DataFrame no session_state
-        log_change(new_row_data['CONTRATO Nº'], 'Adicionado')  # Atualiza o histórico
-        save_to_excel(df_contratos, file_path)  # Salva o DataFrame atualizado
-        st.success('Novo contrato adicionado com sucesso!')
+        obter_objeto('dados')['df_contratos'] = df_contratos  # Atualiza o DataFrame da sessão
+        try:
+            # Salva apenas a nova linha e atualiza o histórico
+            anexar_linhas(new_row, 'Contratos', historico=log_change(new_row_data['CONTRATO Nº'], 'Adicionado'))
+            st.success('Novo contrato adicionado com sucesso!')
+        except Exception as e:
+            st.error(f"Erro ao salvar os dados: {e}")
 
 # Campos para excluir uma linha
 st.sidebar.subheader('Excluir Contrato')
@@ -92,20 +129,85 @@ sistema_excluir = st.sidebar.text_input('Sistema do Contrato para Excluir')
 
 if st.sidebar.button('Excluir Contrato'):
     if contrato_excluir and sistema_excluir:
-        # Filtra o DataFrame para encontrar a linha correspondente
-        mask = (df_contratos['CONTRATO Nº'] == contrato_excluir) & (df_contratos['SISTEMA'] == sistema_excluir)
-        if mask.any():
-            df_contratos = df_contratos[~mask]  # Remove a linha correspondente
-            st.session_state['dados']['df_contratos'] = df_contratos  # Atualiza o DataFrame no session_state
-            log_change(contrato_excluir, 'Excluído')  # Atualiza o histórico
-            save_to_excel(df_contratos, file_path)  # Salva o DataFrame atualizado
-            st.success('Contrato excluído com sucesso!')
+        # Localiza as linhas correspondentes pelo índice
+        rotulos = obter_indice_contratos(df_contratos).localizar(contrato_excluir, sistema_excluir)
+        if rotulos:
+            removidas = df_contratos.loc[rotulos]
+            df_contratos = df_contratos.drop(index=rotulos)  # Remove as linhas correspondentes
+            obter_objeto('dados')['df_contratos'] = df_contratos  # Atualiza o DataFrame da sessão
+            # Salva o DataFrame atualizado e atualiza o histórico
+            if save_to_excel(df_contratos, removidas=removidas, historico=log_change(contrato_excluir, 'Excluído')):
+                st.success('Contrato excluído com sucesso!')
         else:
             st.sidebar.error('Contrato ou sistema não encontrado!')
     else:
         st.sidebar.error('Por favor, preencha ambos os campos: Número do Contrato e Sistema.')
 
-# Opção para exibir histórico
-if st.sidebar.checkbox('Mostrar Histórico de Alterações'):
+# Alterações em lote (uma única transação e uma única escrita)
+st.sidebar.subheader('Alterações em Lote')
+arquivo_lote = st.sidebar.file_uploader(
+    'CSV ou Excel com a coluna OPERAÇÃO',
+    type=['csv', 'xlsx'],
+    help=f"Valores de {COLUNA_OPERACAO}: ADICIONAR, ATUALIZAR ou EXCLUIR. "
+         "Atualizações e exclusões localizam o contrato por CONTRATO Nº e SISTEMA."
+)
+
+if arquivo_lote is not None and st.sidebar.button('Aplicar Lote'):
+    try:
+        lote = ler_lote(arquivo_lote)
+        df_novo, df_log, resumo = aplicar_lote(df_contratos, lote, obter_indice_contratos(df_contratos))
+    except ValueError as e:
+        st.sidebar.error(f'Lote não aplicado:\n{e}')
+    else:
+        try:
+            salvar_planilhas({'Contratos': df_novo}, historico=df_log)
+        except ConflitoDeVersao:
+            avisar_conflito()
+        except Exception as e:
+            st.sidebar.error(f"Erro ao salvar os dados: {e}")
+        else:
+            df_contratos = df_novo
+            obter_objeto('dados')['df_contratos'] = df_novo
+            st.sidebar.success(
+                f"Lote aplicado: {resumo['ADICIONAR']} adicionado(s), "
+                f"{resumo['ATUALIZAR']} atualizado(s), {resumo['EXCLUIR']} excluído(s)."
+            )
+
+# Opção para exibir histórico (só há histórico com um ano selecionado)
+if ano_selecionado is not None and st.sidebar.checkbox('Mostrar Histórico de Alterações'):
     st.subheader('Histórico de Alterações')
-    st.dataframe(st.session_state['dados']['df_historico'])
+    # Filtros e paginação resolvidos pelo índice do log: só a página exibida é lida
+    col_contrato, col_inicio, col_fim, col_tam_hist, col_pag_hist = st.columns([2, 1, 1, 1, 1])
+    with col_contrato:
+        contrato_historico = st.text_input('Contrato Nº', key='historico_contrato')
+    with col_inicio:
+        inicio_historico = st.date_input('De', value=None, key='historico_inicio')
+    with col_fim:
+        fim_historico = st.date_input('Até', value=None, key='historico_fim')
+    with col_tam_hist:
+        tamanho_historico = st.selectbox('Linhas por página', [25, 50, 100], index=1, key='historico_tamanho')
+    historico = obter_historico(ano_selecionado)
+    total_historico = historico.contar(contrato_historico, inicio_historico, fim_historico)
+    with col_pag_hist:
+        numero_historico = st.number_input(
+            'Página', min_value=1, max_value=max(1, -(-total_historico // tamanho_historico)),
+            value=1, step=1, key='historico_pagina'
+        )
+    pagina_historico = historico.consultar(
+        contrato_historico, inicio_historico, fim_historico, numero_historico, tamanho_historico
+    )
+    st.caption(f'{total_historico} alteração(ões) encontrada(s)')
+    st.dataframe(pagina_historico)
+
+# Opção para exibir o uso de memória dos dados carregados
+if st.sidebar.checkbox('Mostrar Uso de Memória'):
+    st.subheader('Uso de Memória (antes e depois do esquema de tipos)')
+    for ano, relatorios in obter_objeto('relatorio_memoria', {}).items():
+        for chave, relatorio in relatorios.items():
+            st.caption(f'{ano} — {chave}')
+            st.dataframe(relatorio)
+
+    st.subheader('Memória por Sessão (MB)')
+    metricas_sessoes, total_sessoes = metricas_memoria()
+    st.caption(f'Total das sessões: {total_sessoes} MB de {ORCAMENTO_MEMORIA_SESSOES_MB:.0f} MB')
+    st.dataframe(metricas_sessoes)
@@ -1,8 +1,16 @@
 import os
+import time
+import uuid
 import streamlit as st
 from pathlib import Path
 import streamlit.components.v1 as components
-from utils import PASTA_ARQUIVOS, cria_chain_conversa
+from utils import PASTA_ARQUIVOS, cria_chain_conversa, validar_openai_key
+from memoria_sessoes import acompanhar_sessao, descartar_objeto, obter_objeto, restaurar_chain
+from contexto import relatorio_da_resposta
+from indexacao import (
+    CANCELADA, CONCLUIDA, cancelar_indexacao, concluir_tarefa, iniciar_indexacao, obter_tarefa,
+    vector_store_da_tarefa
+)
 
 st.set_page_config(layout="wide")
 
@@ -35,8 +43,11 @@ def sidebar():
             help="Faça upload de documentos PDF para iniciar o chat"
         )
         
-        # Processamento dos PDFs enviados
-        if uploaded_pdfs:
+        # Processamento dos PDFs enviados (apenas quando a seleção muda, para
+        # não regravar os arquivos enquanto a indexação os lê)
+        assinatura_upload = tuple((pdf.name, pdf.size) for pdf in uploaded_pdfs or [])
+        if uploaded_pdfs and assinatura_upload != st.session_state.get('assinatura_upload'):
+            st.session_state['assinatura_upload'] = assinatura_upload
             # Limpa PDFs antigos
             try:
                 for arquivo in PASTA_ARQUIVOS.glob('*.pdf'):
@@ -87,17 +98,14 @@ def sidebar():
                 st.sidebar.error('Adicione arquivos .pdf para inicializar o chatbot')
             else:
                 try:
-                    with st.spinner('Inicializando Chatbot...'):
-                        chain = cria_chain_conversa()
-                    
-                    if chain:
-                        st.sidebar.success(f'Chatbot inicializado com {len(pdfs_carregados)} documento(s)!')
-                        # Limpa mensagens anteriores
-                        st.session_state.messages = []
+                    # Valida a chave aqui: a indexação roda fora do contexto do Streamlit
+                    openai_api_key = validar_openai_key()
+                    if openai_api_key:
+                        tarefa = iniciar_indexacao(PASTA_ARQUIVOS, openai_api_key, id_sessao())
+                        st.session_state['indexacao'] = tarefa.chave
+                        st.rerun()
                     else:
                         st.sidebar.error('Falha ao inicializar o chatbot')
-                    
-                    st.rerun()
                 except Exception as e:
                     st.sidebar.error(f"Erro ao inicializar chatbot: {e}")
         
@@ -109,8 +117,12 @@ def sidebar():
                 st.sidebar.success("Todos os documentos foram removidos.")
                 
                 # Limpa o estado da sessão
-                if 'chain' in st.session_state:
-                    del st.session_state['chain']
+                descartar_objeto('chain')
+                descartar_objeto('chain_despejada')
+                # O uploader ainda tem os mesmos arquivos: permite gravá-los de novo
+                st.session_state.pop('assinatura_upload', None)
+                if 'indexacao' in st.session_state:
+                    cancelar_indexacao(st.session_state.pop('indexacao'), id_sessao())
                 
                 # Limpa o histórico de mensagens
                 st.session_state.messages = []
@@ -119,6 +131,58 @@ def sidebar():
             except Exception as e:
                 st.sidebar.error(f"Erro ao limpar documentos: {e}")
 
+def id_sessao() -> str:
+    """Identificador da sessão, usado para compartilhar tarefas de indexação."""
+    if 'id_sessao' not in st.session_state:
+        st.session_state['id_sessao'] = uuid.uuid4().hex
+    return st.session_state['id_sessao']
+
+def acompanhar_indexacao():
+    """Mostra o progresso da indexação em segundo plano e cria o chain ao concluir."""
+    chave = st.session_state.get('indexacao')
+    if not chave:
+        return
+
+    tarefa = obter_tarefa(chave)
+    if tarefa is None:
+        del st.session_state['indexacao']
+        st.sidebar.error('A indexação dos documentos não está mais disponível. Inicie o chatbot novamente.')
+        return
+
+    if tarefa.em_andamento:
+        with st.sidebar.container():
+            st.markdown("### ⏳ Indexando documentos")
+            st.progress(
+                tarefa.progresso(),
+                text=f"Páginas lidas: {tarefa.paginas_lidas} | "
+                     f"Trechos embutidos: {tarefa.chunks_embutidos}/{tarefa.total_chunks or '?'}"
+            )
+            if st.button('Cancelar indexação', use_container_width=True):
+                cancelar_indexacao(chave, id_sessao())
+                del st.session_state['indexacao']
+                st.rerun()
+        # Consulta o progresso novamente sem bloquear a página
+        time.sleep(1)
+        st.rerun()
+
+    del st.session_state['indexacao']
+    if tarefa.status == CONCLUIDA:
+        vector_store = vector_store_da_tarefa(tarefa)
+        concluir_tarefa(chave, id_sessao())
+        chain = cria_chain_conversa(vector_store=vector_store)
+        if chain:
+            # Limpa mensagens anteriores
+            st.session_state.messages = []
+            st.rerun()
+        else:
+            st.sidebar.error('Falha ao inicializar o chatbot')
+    else:
+        concluir_tarefa(chave, id_sessao())
+        if tarefa.status == CANCELADA:
+            st.sidebar.info('Indexação cancelada.')
+        else:
+            st.sidebar.error(f"Erro ao indexar documentos: {tarefa.erro}")
+
 def chat_window():
     """Função para a janela de chat onde os usuários interagem com o ChatBot."""
     st.header('🤖 Bem-vindo ao Chatbot de Documentos', divider=True)
@@ -128,12 +192,11 @@ def chat_window():
         st.session_state.messages = []
 
     # Verifica se o chain foi criado
-    if 'chain' not in st.session_state:
+    chain = obter_objeto('chain')
+    if chain is None:
         st.info('Faça o upload de PDFs e inicialize o Chatbot para começar!')
         return
 
-    chain = st.session_state['chain']
-
     # Exibe histórico de mensagens
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -173,6 +236,15 @@ def chat_window():
                 # Limpa o placeholder e mostra a resposta
                 message_placeholder.markdown(full_response)
 
+                # Economia de tokens na montagem do contexto
+                relatorio = relatorio_da_resposta(response)
+                if relatorio:
+                    st.caption(
+                        f"Contexto: {relatorio['tokens_enviados']} tokens de "
+                        f"{relatorio['trechos_usados']}/{relatorio['trechos_recuperados']} trechos "
+                        f"({relatorio['tokens_economizados']} tokens economizados)"
+                    )
+
                 # Adiciona resposta da IA ao histórico
                 st.session_state.messages.append({
                     "role": "ai", 
@@ -226,8 +298,15 @@ def main():
         components.html(particles_html, height=400, scrolling=False)
 
     # Layout principal
+    acompanhar_sessao()
     sidebar()
+    try:
+        # Sessão ociosa que teve o vector store liberado: recarrega do disco
+        restaurar_chain()
+    except Exception as e:
+        st.error(f"Erro ao restaurar o chatbot: {e}")
     chat_window()
+    acompanhar_indexacao()
 
 if __name__ == '__main__':
     main()
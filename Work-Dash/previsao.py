@@ -0,0 +1,343 @@
+import json
+import math
+import os
+import threading
+from pathlib import Path
+import pandas as pd
+
+# Um arquivo por ano: estado completo na primeira linha e, depois, as alterações acrescentadas
+PASTA_MODELOS = Path(__file__).resolve().parent / 'planilhas' / 'modelos_previsao'
+# Alterações acumuladas no arquivo de um ano antes de regravar o estado completo
+MAX_ALTERACOES_LOG = 200
+# Versão do formato gravado; arquivos de outro formato são reconstruídos
+FORMATO_MODELOS = 2
+GERAL = '__geral__'
+Z_95 = 1.96
+
+
+class RegressaoIncremental:
+    """Regressão linear simples (y = a + b·x) mantida por estatísticas suficientes.
+
+    Incluir ou remover um ponto custa O(1); os coeficientes e a faixa de
+    confiança são calculados a partir das somas, sem reajuste.
+    """
+
+    __slots__ = ('n', 'sx', 'sy', 'sxx', 'sxy', 'syy')
+
+    def __init__(self, n=0, sx=0.0, sy=0.0, sxx=0.0, sxy=0.0, syy=0.0):
+        self.n, self.sx, self.sy, self.sxx, self.sxy, self.syy = n, sx, sy, sxx, sxy, syy
+
+    def adicionar(self, x: float, y: float, peso: int = 1):
+        self.n += peso
+        self.sx += peso * x
+        self.sy += peso * y
+        self.sxx += peso * x * x
+        self.sxy += peso * x * y
+        self.syy += peso * y * y
+
+    def remover(self, x: float, y: float):
+        self.adicionar(x, y, peso=-1)
+
+    def somar(self, outra: 'RegressaoIncremental'):
+        for campo in self.__slots__:
+            setattr(self, campo, getattr(self, campo) + getattr(outra, campo))
+
+    def _centradas(self):
+        sxx = self.sxx - self.sx * self.sx / self.n
+        sxy = self.sxy - self.sx * self.sy / self.n
+        syy = self.syy - self.sy * self.sy / self.n
+        return sxx, sxy, syy
+
+    def coeficientes(self):
+        """Retorna (intercepto, inclinação), ou None se não houver pontos suficientes."""
+        if self.n < 2:
+            return None
+        sxx, sxy, _ = self._centradas()
+        b = sxy / sxx if sxx > 0 else 0.0
+        a = (self.sy - b * self.sx) / self.n
+        return a, b
+
+    def prever(self, x: float):
+        coef = self.coeficientes()
+        return None if coef is None else coef[0] + coef[1] * x
+
+    def intervalo(self, x: float, z: float = Z_95):
+        """Faixa de confiança da reta estimada no ponto x: (inferior, superior)."""
+        y = self.prever(x)
+        if y is None or self.n < 3:
+            return y, y
+        sxx, sxy, syy = self._centradas()
+        b = sxy / sxx if sxx > 0 else 0.0
+        variancia = max(syy - b * sxy, 0.0) / (self.n - 2)
+        media_x = self.sx / self.n
+        termo = 1 / self.n + ((x - media_x) ** 2 / sxx if sxx > 0 else 0.0)
+        margem = z * math.sqrt(variancia * termo)
+        return y - margem, y + margem
+
+    def para_lista(self) -> list:
+        return [getattr(self, campo) for campo in self.__slots__]
+
+
+class MotorPrevisao:
+    """Modelos de DIFERENÇA (reajustado - pago) em função do VALOR PAGO por contrato.
+
+    Mantém um modelo por ÍNDICE e um geral, sobre os mesmos pontos do gráfico
+    (contratos agrupados como em process_data). Os totais e os índices das
+    linhas de cada contrato são guardados para que incluir ou excluir uma linha
+    atualize os modelos sem reler os dados.
+    """
+
+    def __init__(self, versao=None):
+        self.versao = versao
+        self.modelos = {GERAL: RegressaoIncremental()}
+        # contrato -> [valor pago, diferença, [sistema, índice] de cada linha na ordem dos dados]
+        self.contratos = {}
+
+    @staticmethod
+    def _pontos(linhas: pd.DataFrame):
+        """Extrai (contrato, valor pago, diferença, índice, sistema) das linhas numéricas.
+
+        Um ÍNDICE vazio vira None: a linha entra só no modelo geral.
+        """
+        pago = pd.to_numeric(linhas['VALOR PAGO'], errors='coerce').astype(float)
+        reajustado = pd.to_numeric(linhas['VALOR REAJUSTADO'], errors='coerce').astype(float)
+        validas = pago.notna() & reajustado.notna()
+        return list(zip(
+            linhas['CONTRATO Nº'][validas].astype(str),
+            pago[validas].tolist(),
+            (reajustado - pago)[validas].tolist(),
+            [None if pd.isna(indice) else str(indice) for indice in linhas['ÍNDICE'][validas]],
+            linhas['SISTEMA'][validas].astype(str)
+        ))
+
+    @staticmethod
+    def _indice(linhas: list):
+        """Índice do contrato: como o 'first' de process_data, o da primeira linha preenchida."""
+        return next((indice for _, indice in linhas if indice is not None), None)
+
+    def _modelo(self, indice: str) -> RegressaoIncremental:
+        return self.modelos.setdefault(indice, RegressaoIncremental())
+
+    def _retirar_ponto(self, contrato: str):
+        x, y, linhas = self.contratos[contrato]
+        self.modelos[GERAL].remover(x, y)
+        indice = self._indice(linhas)
+        if indice is not None:
+            self._modelo(indice).remover(x, y)
+
+    def _incluir_ponto(self, contrato: str):
+        x, y, linhas = self.contratos[contrato]
+        self.modelos[GERAL].adicionar(x, y)
+        indice = self._indice(linhas)
+        if indice is not None:
+            self._modelo(indice).adicionar(x, y)
+
+    def _somar(self, contrato: str, x: float, y: float, linhas: list):
+        """Acrescenta linhas ([sistema, índice]) ao fim do contrato, como novas linhas dos dados."""
+        if contrato in self.contratos:
+            self._retirar_ponto(contrato)
+            total = self.contratos[contrato]
+            total[0] += x
+            total[1] += y
+            total[2].extend(list(linha) for linha in linhas)
+        else:
+            self.contratos[contrato] = [x, y, [list(linha) for linha in linhas]]
+        self._incluir_ponto(contrato)
+
+    def adicionar_linhas(self, linhas: pd.DataFrame):
+        """Inclui linhas de contrato nos modelos (O(1) por linha)."""
+        self.adicionar_pontos(self._pontos(linhas))
+
+    def adicionar_pontos(self, pontos):
+        """Inclui pontos (contrato, valor pago, diferença, índice, sistema) nos modelos."""
+        for contrato, x, y, indice, sistema in pontos:
+            self._somar(contrato, x, y, [[sistema, indice]])
+
+    def remover_linhas(self, linhas: pd.DataFrame):
+        """Retira linhas de contrato dos modelos (O(linhas do contrato) por linha)."""
+        self.remover_pontos(self._pontos(linhas))
+
+    def remover_pontos(self, pontos):
+        """Retira pontos (contrato, valor pago, diferença, índice, sistema) dos modelos.
+
+        Sai a primeira linha do contrato com o mesmo sistema e índice. Se era a
+        que definia o índice do contrato, ele passa ao da nova primeira linha,
+        como em process_data. A exclusão da página de Dados retira todas as
+        linhas de um contrato e sistema, então a ordem das restantes é exata.
+        """
+        for contrato, x, y, indice, sistema in pontos:
+            if contrato not in self.contratos:
+                continue
+            self._retirar_ponto(contrato)
+            total = self.contratos[contrato]
+            total[0] -= x
+            total[1] -= y
+            if [sistema, indice] in total[2]:
+                total[2].remove([sistema, indice])
+            else:
+                total[2].pop(0)
+            if total[2]:
+                self._incluir_ponto(contrato)
+            else:
+                del self.contratos[contrato]
+
+    @classmethod
+    def construir(cls, df: pd.DataFrame, versao=None) -> 'MotorPrevisao':
+        motor = cls(versao)
+        motor.adicionar_linhas(df)
+        return motor
+
+    @classmethod
+    def combinar(cls, motores: list) -> 'MotorPrevisao':
+        """Junta os modelos de vários anos.
+
+        Como em process_data sobre os anos concatenados, um contrato presente
+        em mais de um ano vira um único ponto com os totais somados.
+        """
+        combinado = cls()
+        for motor in motores:
+            for contrato, (x, y, linhas) in motor.contratos.items():
+                combinado._somar(contrato, x, y, linhas)
+        return combinado
+
+    def restrito(self, contratos) -> 'MotorPrevisao':
+        """Modelos apenas dos contratos informados (ex.: os do gráfico após os filtros).
+
+        Usa os totais guardados de cada contrato: O(contratos), sem reler os dados.
+        """
+        contratos = set(contratos)
+        if contratos >= self.contratos.keys():
+            return self
+        parcial = MotorPrevisao(self.versao)
+        for contrato, (x, y, linhas) in self.contratos.items():
+            if contrato in contratos:
+                parcial._somar(contrato, x, y, linhas)
+        return parcial
+
+    def para_dict(self) -> dict:
+        return {
+            'formato': FORMATO_MODELOS,
+            'versao': self.versao,
+            'modelos': {indice: modelo.para_lista() for indice, modelo in self.modelos.items()},
+            'contratos': self.contratos,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> 'MotorPrevisao':
+        if dados.get('formato') != FORMATO_MODELOS:
+            raise ValueError(f"Formato de modelos não suportado: {dados.get('formato')}")
+        motor = cls(dados['versao'])
+        motor.modelos = {indice: RegressaoIncremental(*valores) for indice, valores in dados['modelos'].items()}
+        motor.contratos = dados['contratos']
+        return motor
+
+
+# Modelos compartilhados pelas sessões do processo: ano -> MotorPrevisao
+_motores = {}
+# Alterações já acrescentadas ao arquivo de cada ano desde o último estado completo
+_alteracoes = {}
+_lock = threading.Lock()
+
+
+def _arquivo(ano: int) -> Path:
+    return PASTA_MODELOS / f'{ano}.jsonl'
+
+
+def _ler_arquivo(ano: int):
+    """Lê o estado completo do ano e reaplica as alterações registradas depois dele.
+
+    Returns:
+        tuple: (MotorPrevisao ou None, número de alterações reaplicadas)
+    """
+    try:
+        linhas = _arquivo(ano).read_bytes().splitlines()
+    except FileNotFoundError:
+        return None, 0
+    try:
+        motor = MotorPrevisao.de_dict(json.loads(linhas[0]))
+    except (IndexError, ValueError, KeyError):
+        return None, 0
+    aplicadas = 0
+    for linha in linhas[1:]:
+        try:
+            alteracao = json.loads(linha)
+        except ValueError:
+            break  # Linha incompleta: o restante é ignorado e a versão não bate
+        if alteracao['versao_anterior'] != motor.versao:
+            break
+        motor.remover_pontos(alteracao['removidas'])
+        motor.adicionar_pontos(alteracao['adicionadas'])
+        motor.versao = alteracao['versao']
+        aplicadas += 1
+    return motor, aplicadas
+
+
+def _persistir(ano: int, motor: MotorPrevisao):
+    """Grava o estado completo dos modelos do ano (escrita atômica)."""
+    PASTA_MODELOS.mkdir(parents=True, exist_ok=True)
+    temporario = _arquivo(ano).with_suffix('.tmp')
+    temporario.write_text(json.dumps(motor.para_dict()) + '\n', encoding='utf-8')
+    os.replace(temporario, _arquivo(ano))
+    _alteracoes[ano] = 0
+
+
+def _registrar_alteracao(ano: int, motor: MotorPrevisao, versao_anterior, adicionadas: list, removidas: list):
+    """Acrescenta ao arquivo só os pontos alterados; a cada MAX_ALTERACOES_LOG, regrava o estado."""
+    if ano not in _alteracoes or _alteracoes[ano] >= MAX_ALTERACOES_LOG or not _arquivo(ano).exists():
+        _persistir(ano, motor)
+        return
+    alteracao = {
+        'versao_anterior': versao_anterior,
+        'versao': motor.versao,
+        'adicionadas': adicionadas,
+        'removidas': removidas,
+    }
+    with open(_arquivo(ano), 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(alteracao) + '\n')
+    _alteracoes[ano] += 1
+
+
+def obter_motor(ano: int, versao, ler_contratos) -> MotorPrevisao:
+    """Retorna os modelos do ano na versão informada dos dados.
+
+    Usa, nesta ordem, a memória do processo, o arquivo persistido e, só se a
+    versão não bater, reconstrói a partir de `ler_contratos()`.
+    """
+    with _lock:
+        motor = _motores.get(ano)
+        if motor is not None and motor.versao == versao:
+            return motor
+        salvo, aplicadas = _ler_arquivo(ano)
+        if salvo is not None and salvo.versao == versao:
+            motor = salvo
+            _alteracoes[ano] = aplicadas
+        else:
+            motor = MotorPrevisao.construir(ler_contratos(), versao)
+            _persistir(ano, motor)
+        _motores[ano] = motor
+        return motor
+
+
+def atualizar_motor(ano: int, versao_anterior, versao_nova, adicionadas=None, removidas=None):
+    """Aplica uma alteração aos modelos do ano e avança sua versão.
+
+    Se os modelos em memória não estão na versão anterior à escrita, são
+    descartados e reconstruídos na próxima consulta.
+    """
+    with _lock:
+        motor = _motores.get(ano)
+        if motor is None or motor.versao != versao_anterior:
+            _motores.pop(ano, None)
+            return
+        pontos_removidos = MotorPrevisao._pontos(removidas) if removidas is not None else []
+        pontos_adicionados = MotorPrevisao._pontos(adicionadas) if adicionadas is not None else []
+        motor.remover_pontos(pontos_removidos)
+        motor.adicionar_pontos(pontos_adicionados)
+        motor.versao = versao_nova
+        _registrar_alteracao(ano, motor, versao_anterior, pontos_adicionados, pontos_removidos)
+
+
+def invalidar_motor(ano: int):
+    """Descarta os modelos do ano (ex.: após uma alteração em lote)."""
+    with _lock:
+        _motores.pop(ano, None)
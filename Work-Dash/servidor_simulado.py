@@ -0,0 +1,112 @@
+"""Servidor local que imita a API da OpenAI (modelos, embeddings e chat).
+
+Usado para medir o modo em lote sem rede e sem custo:
+
+    python servidor_simulado.py --porta 8765 --latencia 0.2
+    python lote_perguntas.py perguntas.txt --base-url http://127.0.0.1:8765/v1
+"""
+import argparse
+import base64
+import hashlib
+import json
+import struct
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIMENSAO = 256
+
+
+def vetor(texto: str, dimensao: int = DIMENSAO) -> list:
+    """Embedding determinístico: palavras espalhadas por hash e normalizadas."""
+    valores = [0.0] * dimensao
+    for palavra in texto.lower().split():
+        digest = hashlib.md5(palavra.encode('utf-8')).digest()
+        posicao = int.from_bytes(digest[:4], 'little') % dimensao
+        valores[posicao] += 1.0 if digest[4] % 2 else -1.0
+    norma = sum(v * v for v in valores) ** 0.5 or 1.0
+    return [v / norma for v in valores]
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    latencia = 0.0
+
+    def _responder(self, corpo: dict, status: int = 200):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _ler_corpo(self) -> dict:
+        tamanho = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(tamanho) or b'{}')
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._responder({'object': 'list', 'data': [{'id': 'simulado', 'object': 'model', 'owned_by': 'local'}]})
+        else:
+            self._responder({'error': {'message': 'Rota não encontrada'}}, 404)
+
+    def do_POST(self):
+        corpo = self._ler_corpo()
+        if self.path.endswith('/embeddings'):
+            self._embeddings(corpo)
+        elif self.path.endswith('/chat/completions'):
+            self._chat(corpo)
+        else:
+            self._responder({'error': {'message': 'Rota não encontrada'}}, 404)
+
+    def _embeddings(self, corpo: dict):
+        entradas = corpo.get('input', [])
+        if isinstance(entradas, str) or (entradas and isinstance(entradas[0], int)):
+            entradas = [entradas]
+        dados = []
+        for i, entrada in enumerate(entradas):
+            # Listas de tokens são tratadas como texto
+            texto = entrada if isinstance(entrada, str) else ' '.join(map(str, entrada))
+            valores = vetor(texto)
+            if corpo.get('encoding_format') == 'base64':
+                valores = base64.b64encode(struct.pack(f'<{len(valores)}f', *valores)).decode('ascii')
+            dados.append({'object': 'embedding', 'index': i, 'embedding': valores})
+        self._responder({
+            'object': 'list', 'data': dados, 'model': corpo.get('model', 'simulado'),
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0},
+        })
+
+    def _chat(self, corpo: dict):
+        time.sleep(self.latencia)
+        mensagens = corpo.get('messages', [])
+        pergunta = mensagens[-1].get('content', '') if mensagens else ''
+        resposta = f"Resposta simulada ({len(str(pergunta))} caracteres no prompt)."
+        self._responder({
+            'id': f'chatcmpl-{uuid.uuid4().hex}', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': corpo.get('model', 'simulado'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': resposta}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        })
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API da OpenAI.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Atraso artificial de cada resposta do chat, em segundos")
+    args = parser.parse_args()
+
+    Manipulador.latencia = args.latencia
+    servidor = ThreadingHTTPServer((args.host, args.porta), Manipulador)
+    print(f"Servidor simulado em http://{args.host}:{args.porta}/v1")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Snapshots do painel: métricas e gráficos pré-calculados por combinação de filtros.
+
+Para cada ano são gerados a visão padrão (todos os status e meses), cada
+status isolado e cada mês isolado; para todos os anos juntos, só a visão
+padrão. Cada snapshot guarda a versão dos dados de que foi gerado e só é
+usado enquanto ela for a atual.
+
+Uso: python snapshots.py [ano ...]
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import plotly.io as pio
+from armazenamento import obter_armazenamento
+from esquema import ESQUEMA_CONTRATOS, aplicar_esquema, ordenar_meses
+from graficos import gerar_figuras
+from metricas import process_data, calculate_metrics, agrupar_contratos
+from previsao import MotorPrevisao, obter_motor
+
+ARQUIVO_SNAPSHOTS = Path(__file__).resolve().parent / 'planilhas' / 'snapshots.json'
+# Marca um filtro com todos os valores selecionados
+TODOS = '*'
+
+
+def chave(anos: list, status=TODOS, meses=TODOS) -> str:
+    """Chave da combinação de filtros; a ordem da seleção não importa."""
+    normalizar = lambda valores: valores if valores == TODOS else sorted(str(v) for v in valores)
+    return json.dumps([sorted(anos), normalizar(status), normalizar(meses)], ensure_ascii=False)
+
+
+def filtro(selecionados: list, opcoes: list):
+    """Converte uma seleção em TODOS quando ela abrange todas as opções."""
+    return TODOS if set(selecionados) == set(opcoes) else selecionados
+
+
+def _versoes(armazenamento, anos: list) -> dict:
+    return {str(ano): armazenamento.versao(ano) for ano in anos}
+
+
+def _agrupar(armazenamento, anos: list) -> pd.DataFrame:
+    """Contratos agrupados dos anos, como no painel."""
+    if armazenamento.suporta_consultas:
+        return agrupar_contratos(armazenamento, anos)
+    brutos = pd.concat([armazenamento.ler('Contratos', ano) for ano in anos], ignore_index=True)
+    return process_data(aplicar_esquema(brutos, ESQUEMA_CONTRATOS))
+
+
+def modelos(armazenamento, anos: list) -> MotorPrevisao:
+    """Modelos de previsão dos anos, lidos direto do armazenamento."""
+    motores = [
+        obter_motor(ano, armazenamento.versao(ano), lambda ano=ano: armazenamento.ler('Contratos', ano))
+        for ano in anos
+    ]
+    return motores[0] if len(motores) == 1 else MotorPrevisao.combinar(motores)
+
+
+def _gerar(armazenamento, anos: list, completo: bool) -> dict:
+    """Gera os snapshots de uma seleção de anos."""
+    # A versão é lida antes dos dados: uma escrita concorrente deixa o snapshot obsoleto
+    versoes = _versoes(armazenamento, anos)
+    agrupado = _agrupar(armazenamento, anos)
+    status = [str(s) for s in agrupado['STATUS / AÇÃO'].dropna().unique()]
+    meses = [str(m) for m in ordenar_meses(agrupado['MÊS'].dropna().unique())]
+    motor = modelos(armazenamento, anos)
+
+    combinacoes = [(TODOS, TODOS)]
+    if completo:
+        combinacoes += [([s], TODOS) for s in status] + [(TODOS, [m]) for m in meses]
+
+    snapshots = {}
+    for filtro_status, filtro_meses in combinacoes:
+        filtrado = agrupado[
+            agrupado['STATUS / AÇÃO'].isin(status if filtro_status == TODOS else filtro_status) &
+            agrupado['MÊS'].isin(meses if filtro_meses == TODOS else filtro_meses)
+        ]
+        snapshots[chave(anos, filtro_status, filtro_meses)] = {
+            'anos': sorted(anos),
+            'versoes': versoes,
+            'opcoes': {'status': status, 'meses': meses},
+            'metricas': {nome: float(valor) for nome, valor in calculate_metrics(filtrado).items()},
+            'figuras': {nome: fig.to_json() for nome, fig in gerar_figuras(filtrado, motor).items()},
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        }
+    return snapshots
+
+
+# Snapshots lidos do arquivo, reaproveitados enquanto ele não muda: (mtime, conteúdo)
+_cache = (None, {})
+_lock = threading.Lock()
+
+
+def _ler_arquivo() -> dict:
+    global _cache
+    try:
+        mtime = ARQUIVO_SNAPSHOTS.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _cache[0] != mtime:
+        try:
+            _cache = (mtime, json.loads(ARQUIVO_SNAPSHOTS.read_text(encoding='utf-8')))
+        except ValueError:
+            return {}
+    return _cache[1]
+
+
+def gerar_snapshots(armazenamento=None, anos=None):
+    """Regenera os snapshots dos anos informados (todos, se omitidos) e da visão de todos os anos."""
+    armazenamento = armazenamento or obter_armazenamento()
+    disponiveis = armazenamento.anos()
+    anos = disponiveis if anos is None else [ano for ano in anos if ano in disponiveis]
+
+    novos = {}
+    for ano in anos:
+        novos.update(_gerar(armazenamento, [ano], completo=True))
+    if len(disponiveis) > 1:
+        novos.update(_gerar(armazenamento, disponiveis, completo=False))
+
+    with _lock:
+        conteudo = {
+            chave_snapshot: snapshot for chave_snapshot, snapshot in _ler_arquivo().items()
+            if all(ano in disponiveis for ano in snapshot['anos'])
+        }
+        conteudo.update(novos)
+        # Escrita atômica: leitores veem o arquivo antigo ou o novo, nunca parcial
+        temporario = ARQUIVO_SNAPSHOTS.with_suffix('.tmp')
+        temporario.write_text(json.dumps(conteudo, ensure_ascii=False), encoding='utf-8')
+        os.replace(temporario, ARQUIVO_SNAPSHOTS)
+
+
+def obter_snapshot(armazenamento, anos: list, status=TODOS, meses=TODOS):
+    """Retorna o snapshot da combinação de filtros, ou None se não existir ou estiver obsoleto.
+
+    As figuras são devolvidas já convertidas para objetos Plotly.
+    """
+    if not anos:
+        return None
+    snapshot = _ler_arquivo().get(chave(anos, status, meses))
+    if snapshot is None or snapshot['versoes'] != _versoes(armazenamento, anos):
+        return None
+    return dict(snapshot, figuras={nome: pio.from_json(fig) for nome, fig in snapshot['figuras'].items()})
+
+
+# Regeneração em segundo plano, uma por vez; pedidos repetidos para o mesmo ano são agrupados
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshots')
+_pendentes = set()
+
+
+def _regenerar(ano: int):
+    with _lock:
+        _pendentes.discard(ano)
+    try:
+        gerar_snapshots(anos=[ano])
+    except Exception as e:
+        # Sem snapshot, o painel calcula ao vivo
+        print(f"Falha ao gerar snapshots de {ano}: {e}", file=sys.stderr)
+
+
+def agendar_snapshots(ano: int):
+    """Agenda a regeneração dos snapshots do ano após uma alteração nos dados."""
+    with _lock:
+        if ano in _pendentes:
+            return
+        _pendentes.add(ano)
+    _executor.submit(_regenerar, ano)
+
+
+if __name__ == '__main__':
+    gerar_snapshots(anos=[int(ano) for ano in sys.argv[1:]] or None)
+    print(f"Snapshots gravados em {ARQUIVO_SNAPSHOTS}")
@@ -0,0 +1,59 @@
+import io
+import warnings
+import numpy as np
+import pandas as pd
+from esquema import ESQUEMA_CONTRATOS, aplicar_esquema
+from indice_contratos import aplicar_lote, ler_lote
+
+
+def contratos() -> pd.DataFrame:
+    """Contratos com VALOR PAGO inteiro e pequeno (cabia em int16 antes do esquema fixar int64)."""
+    return aplicar_esquema(pd.DataFrame({
+        'CONTRATO Nº': ['19/2018', '20/2018'],
+        'SISTEMA': ['SISTEMA 01', 'SISTEMA 02'],
+        'STATUS / AÇÃO': ['RENOVADO', 'CANCELADO'],
+        'VALOR PAGO': [1200, 3400],
+    }), ESQUEMA_CONTRATOS)
+
+
+def lote(conteudo: str):
+    arquivo = io.BytesIO(conteudo.encode('utf-8'))
+    arquivo.name = 'lote.csv'
+    return ler_lote(arquivo)
+
+
+def test_valor_pago_inteiro_fica_em_int64():
+    assert contratos()['VALOR PAGO'].dtype == np.int64
+
+
+def test_atualizar_valor_acima_de_int16():
+    df = contratos()
+    novo, df_log, resumo = aplicar_lote(
+        df, lote('OPERAÇÃO,CONTRATO Nº,SISTEMA,VALOR PAGO\nATUALIZAR,19/2018,SISTEMA 01,50000\n')
+    )
+    assert novo.loc[novo['CONTRATO Nº'] == '19/2018', 'VALOR PAGO'].tolist() == [50000]
+    assert novo.loc[novo['CONTRATO Nº'] == '20/2018', 'VALOR PAGO'].tolist() == [3400]
+    assert resumo['ATUALIZAR'] == 1
+    assert df_log['AÇÃO'].tolist() == ['Atualizado (lote)']
+
+
+def test_atualizar_coluna_inteira_compacta_e_ampliada():
+    df = contratos().astype({'VALOR PAGO': np.int16})
+    novo, _, _ = aplicar_lote(
+        df, lote('OPERAÇÃO,CONTRATO Nº,SISTEMA,VALOR PAGO\nATUALIZAR,20/2018,SISTEMA 02,70000.5\n')
+    )
+    assert novo.loc[novo['CONTRATO Nº'] == '20/2018', 'VALOR PAGO'].tolist() == [70000.5]
+    assert df['VALOR PAGO'].dtype == np.int16
+
+
+def test_atualizar_coluna_float32_amplia_para_float64():
+    df = contratos().assign(**{'VALOR REAJUSTADO': np.array([1234.5, 2345.25], dtype=np.float32)})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        novo, _, _ = aplicar_lote(
+            df, lote('OPERAÇÃO,CONTRATO Nº,SISTEMA,VALOR REAJUSTADO\nATUALIZAR,19/2018,SISTEMA 01,12345678.91\n')
+        )
+    assert novo['VALOR REAJUSTADO'].dtype == np.float64
+    assert novo.loc[novo['CONTRATO Nº'] == '19/2018', 'VALOR REAJUSTADO'].tolist() == [12345678.91]
+    assert novo.loc[novo['CONTRATO Nº'] == '20/2018', 'VALOR REAJUSTADO'].tolist() == [2345.25]
+    assert df['VALOR REAJUSTADO'].dtype == np.float32
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from armazenamento import ArmazenamentoSQLite
+from esquema import ESQUEMA_CONTRATOS, aplicar_esquema
+from metricas import agrupar_contratos, calcular_metricas, calculate_metrics, process_data
+
+
+def contratos(linhas: list) -> pd.DataFrame:
+    colunas = ['CONTRATO Nº', 'EMPRESA', 'SISTEMA', 'MÊS', 'ÍNDICE', 'VALOR PAGO', 'VALOR REAJUSTADO',
+               'PEDIDO/ORDEM DE COMPRAS', 'STATUS / AÇÃO', 'DIFERENÇA DE VALOR DE CONTRATO']
+    return aplicar_esquema(pd.DataFrame(linhas, columns=colunas), ESQUEMA_CONTRATOS)
+
+
+# Dois anos; contratos com mais de uma linha e um contrato presente nos dois anos
+ANOS = {
+    2023: contratos([
+        ['10/2023', 'EMPRESA A', 'SISTEMA 01', 'JANEIRO', 'IPCA', 1000.0, 1100.5, 'PO-1', 'RENOVADO', 100.5],
+        ['10/2023', 'EMPRESA A', 'SISTEMA 02', 'MARÇO', 'IGPM', 500.0, 520.0, 'PO-2', 'CANCELADO', 20.0],
+        ['11/2023', 'EMPRESA B', 'SISTEMA 01', 'FEVEREIRO', 'IGPM', 2000.0, 2100.0, 'PO-3', 'EM PROCESSO', 100.0],
+    ]),
+    2024: contratos([
+        ['11/2023', 'EMPRESA B', 'SISTEMA 01', 'JANEIRO', 'IPCA', 300.0, 330.0, 'PO-4', 'RENOVADO', 30.0],
+        ['12/2024', 'EMPRESA C', 'SISTEMA 03', 'JANEIRO', 'IPCA', 4000.0, 4250.25, 'PO-5', 'CANCELADO', 250.25],
+        ['13/2024', 'EMPRESA D', 'SISTEMA 01', 'MARÇO', 'INPC', 750.0, 800.0, 'PO-6', 'RENOVADO', 50.0],
+        ['13/2024', 'EMPRESA D', 'SISTEMA 02', 'MARÇO', 'INPC', 250.0, 240.0, 'PO-7', 'RENOVADO', -10.0],
+    ]),
+}
+
+
+@pytest.fixture
+def armazenamento(tmp_path):
+    armazenamento = ArmazenamentoSQLite(tmp_path / 'contratos.db')
+    for ano, df in ANOS.items():
+        armazenamento.salvar({'Contratos': df}, ano)
+    return armazenamento
+
+
+def agrupado_pandas(anos, status=None, meses=None) -> pd.DataFrame:
+    """Caminho em memória do painel: process_data sobre os anos seguido dos filtros."""
+    # Sem anos, como leitura_de_dados([]): tabela vazia com as colunas do esquema
+    agrupado = process_data(pd.concat([ANOS[ano] for ano in anos], ignore_index=True) if anos else contratos([]))
+    if status is not None:
+        agrupado = agrupado[agrupado['STATUS / AÇÃO'].isin(status)]
+    if meses is not None:
+        agrupado = agrupado[agrupado['MÊS'].isin(meses)]
+    return agrupado
+
+
+CASOS = [
+    ([2023], None, None),
+    ([2024], None, None),
+    ([2023, 2024], None, None),
+    ([2023, 2024], ['RENOVADO'], None),
+    ([2023, 2024], None, ['JANEIRO', 'MARÇO']),
+    ([2023, 2024], ['RENOVADO', 'CANCELADO'], ['MARÇO']),
+    ([2023, 2024], [], None),
+    ([2023, 2024], None, []),
+]
+
+
+@pytest.mark.parametrize('anos, status, meses', CASOS)
+def test_agrupar_contratos_igual_a_process_data(armazenamento, anos, status, meses):
+    esperado = agrupado_pandas(anos, status, meses)
+    obtido = agrupar_contratos(armazenamento, anos, status, meses)
+    assert obtido['CONTRATO Nº'].tolist() == esperado['CONTRATO Nº'].tolist()
+    for coluna in esperado.columns:
+        if pd.api.types.is_numeric_dtype(esperado[coluna]):
+            np.testing.assert_allclose(obtido[coluna].to_numpy(float), esperado[coluna].to_numpy(float))
+        else:
+            assert obtido[coluna].astype(str).tolist() == esperado[coluna].astype(str).tolist(), coluna
+
+
+@pytest.mark.parametrize('anos, status, meses', CASOS)
+def test_calcular_metricas_igual_a_calculate_metrics(armazenamento, anos, status, meses):
+    esperado = calculate_metrics(agrupado_pandas(anos, status, meses))
+    obtido = calcular_metricas(armazenamento, anos, status, meses)
+    assert obtido.keys() == esperado.keys()
+    for nome, valor in esperado.items():
+        assert obtido[nome] == pytest.approx(valor), nome
+
+
+def test_selecao_de_anos_vazia(armazenamento):
+    assert agrupar_contratos(armazenamento, []).empty
+    assert agrupado_pandas([]).empty
+    assert calcular_metricas(armazenamento, []) == pytest.approx(calculate_metrics(agrupado_pandas([])))
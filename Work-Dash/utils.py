@@ -7,10 +7,10 @@ from langchain.prompts import PromptTemplate
 from langchain_community.document_loaders.pdf import PyPDFLoader
 from langchain_community.vectorstores.faiss import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai.embeddings import OpenAIEmbeddings
-from langchain_openai.chat_models import ChatOpenAI
 from configs import *
-import openai
+from contexto import RetrieverComOrcamento
+from memoria_sessoes import guardar_objeto
+from clientes import chave_validada, estatisticas, modelo_chat, modelo_embeddings
 
 def configurar_pasta_documentos():
     """
@@ -71,10 +71,8 @@ def validar_openai_key():
         key = get_key()
         if key and key.strip():  # Verifica se a chave não está vazia
             try:
-                # Validação da chave
-                client = openai.OpenAI(api_key=key)
-                # Tenta fazer uma chamada simples para verificar
-                client.models.list()
+                # Validação da chave (uma vez por processo, com o cliente compartilhado)
+                chave_validada(key)
                 
                 # Define a chave no ambiente
                 os.environ["OPENAI_API_KEY"] = key
@@ -108,6 +106,16 @@ def mostrar_status_chave():
     else:
         st.sidebar.error("Nenhuma chave OpenAI encontrada")
 
+    # Reaproveitamento de conexões e latência do cliente HTTP compartilhado
+    resumo = estatisticas.resumo()
+    with st.sidebar.expander("Conexões OpenAI"):
+        st.write(
+            f"{resumo['requisicoes']} requisição(ões), {resumo['conexoes_novas']} conexão(ões) aberta(s), "
+            f"{resumo['reaproveitamento']:.0%} reaproveitadas"
+        )
+        for rota, dados in resumo['rotas'].items():
+            st.caption(f"{rota}: {dados['requisicoes']} req., p50 {dados['p50_ms']} ms, p95 {dados['p95_ms']} ms")
+
 # Pode ser chamado no início do seu script principal ou página
 def configurar_ambiente_openai():
     """
@@ -144,6 +152,22 @@ def importacao_documentos(pasta=PASTA_ARQUIVOS) -> list:
     
     return documentos
 
+def dividir_documentos(documentos: list) -> list:
+    """Divide documentos em partes menores, sem usar o Streamlit (seguro fora das páginas)."""
+    recur_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,  # Reduzido para melhor processamento
+        chunk_overlap=100,
+        separators=["\n\n", "\n", ".", " ", ""]
+    )
+    documentos_divididos = recur_splitter.split_documents(documentos)
+
+    # Adiciona metadados a cada documento
+    for i, doc in enumerate(documentos_divididos):
+        doc.metadata['source'] = str(doc.metadata.get('source', f'documento_{i}'))
+        doc.metadata['doc_id'] = i
+
+    return documentos_divididos
+
 def split_de_documentos(documentos: list) -> list:
     """Divide documentos em partes menores."""
     if not documentos:
@@ -151,19 +175,7 @@ def split_de_documentos(documentos: list) -> list:
         return []
     
     try:
-        recur_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,  # Reduzido para melhor processamento
-            chunk_overlap=100,
-            separators=["\n\n", "\n", ".", " ", ""]
-        )
-        documentos_divididos = recur_splitter.split_documents(documentos)
-
-        # Adiciona metadados a cada documento
-        for i, doc in enumerate(documentos_divididos):
-            doc.metadata['source'] = str(doc.metadata.get('source', f'documento_{i}'))
-            doc.metadata['doc_id'] = i
-
-        return documentos_divididos
+        return dividir_documentos(documentos)
     except Exception as e:
         st.error(f"Erro ao dividir documentos: {e}")
         return []
@@ -182,7 +194,7 @@ def cria_vector_store(documentos: list):
         os.environ["OPENAI_API_KEY"] = openai_api_key
 
         # Cria embeddings
-        embedding_model = OpenAIEmbeddings(api_key=openai_api_key)
+        embedding_model = modelo_embeddings(openai_api_key, **get_config('embedding_kwargs', {}))
         
         # Cria vetor de armazenamento
         vector_store = FAISS.from_documents(
@@ -196,32 +208,64 @@ def cria_vector_store(documentos: list):
         st.error(f"Erro ao criar vector store: {e}")
         return None
 
-def cria_chain_conversa():
+def monta_chain(vector_store, openai_api_key: str, memory=None, verbose=True):
+    """Monta a cadeia de conversação sobre um vector store já criado.
+
+    Sem `memory`, o histórico deve ser passado em cada chamada
+    (`chat_history`), o que permite usar a mesma cadeia em paralelo.
+    """
+    # Configurações do modelo
+    chat = modelo_chat(openai_api_key, get_config('model_name', 'gpt-3.5-turbo'), temperatura=0.3)
+
+    # Configura recuperador, com montagem do contexto dentro do orçamento de tokens
+    retriever = RetrieverComOrcamento(
+        retriever=vector_store.as_retriever(
+            search_type=get_config('retrieval_search_type', 'similarity'),
+            search_kwargs=get_config('retrieval_kwargs', {'k': 4})
+        ),
+        orcamento_tokens=get_config('context_token_budget', 1200),
+        modelo=get_config('model_name', 'gpt-3.5-turbo')
+    )
+
+    # Cria cadeia de conversação
+    return ConversationalRetrievalChain.from_llm(
+        llm=chat,
+        memory=memory,
+        retriever=retriever,
+        return_source_documents=True,
+        verbose=verbose
+    )
+
+def cria_chain_conversa(vector_store=None):
     """
     Cria a cadeia de conversa para o chatbot.
+
+    Se `vector_store` for informado (ex.: gerado pela indexação em segundo
+    plano), os documentos não são carregados novamente.
     """
     try:
-        # Carrega documentos
-        documentos = importacao_documentos()
-        
-        # Verifica se há documentos
-        if not documentos:
-            st.error("Nenhum documento carregado.")
-            return None
-        
-        # Divide documentos
-        documentos_divididos = split_de_documentos(documentos)
-        
-        if not documentos_divididos:
-            st.error("Falha ao dividir documentos.")
-            return None
-        
-        # Cria vector store
-        vector_store = cria_vector_store(documentos_divididos)
-        
-        if not vector_store:
-            st.error("Falha ao criar vector store.")
-            return None
+        if vector_store is None:
+            # Carrega documentos
+            documentos = importacao_documentos()
+            
+            # Verifica se há documentos
+            if not documentos:
+                st.error("Nenhum documento carregado.")
+                return None
+            
+            # Divide documentos
+            documentos_divididos = split_de_documentos(documentos)
+            
+            if not documentos_divididos:
+                st.error("Falha ao dividir documentos.")
+                return None
+            
+            # Cria vector store
+            vector_store = cria_vector_store(documentos_divididos)
+            
+            if not vector_store:
+                st.error("Falha ao criar vector store.")
+                return None
         
         # Obtém chave OpenAI
         openai_api_key = validar_openai_key()
@@ -229,40 +273,20 @@ def cria_chain_conversa():
             st.error("Chave OpenAI não configurada.")
             return None
         
-        # Configurações do modelo
-        chat = ChatOpenAI(
-            model=get_config('model_name', 'gpt-3.5-turbo'),
-            api_key=openai_api_key,
-            temperature=0.3
-        )
-        
         # Configura memória
         memory = ConversationBufferMemory(
             return_messages=True,
             memory_key='chat_history',
             output_key='answer'
         )
-        
-        # Configura recuperador
-        retriever = vector_store.as_retriever(
-            search_type=get_config('retrieval_search_type', 'similarity'),
-            search_kwargs=get_config('retrieval_kwargs', {'k': 4})
-        )
-        
-        # Cria cadeia de conversação
-        chat_chain = ConversationalRetrievalChain.from_llm(
-            llm=chat,
-            memory=memory,
-            retriever=retriever,
-            return_source_documents=True,
-            verbose=True
-        )
 
-        # Armazena no estado da sessão
-        st.session_state['chain'] = chat_chain
+        chat_chain = monta_chain(vector_store, openai_api_key, memory=memory)
+
+        # Armazena nos objetos da sessão
+        guardar_objeto('chain', chat_chain)
         
         # Feedback de sucesso
-        st.success(f"Chatbot inicializado com {len(documentos)} documento(s)!")
+        st.success(f"Chatbot inicializado com {vector_store.index.ntotal} trecho(s) indexado(s)!")
         
         return chat_chain
     